@@ -1,5 +1,6 @@
 #include <algorithm>
 #include <array>
+#include <mutex>
 #include <string>
 #include <cstdio>
 #include <cstring>
@@ -556,12 +557,14 @@ static const TAG_INFO2 g_tagInfo2[] =
 	{ 0x2FD311F0, pauth_f7aa47f6_2, 0x47, 5, pauth_f7aa47f6_xor },
 };
 
-static const TAG_INFO2 *GetTagInfo2(u32 tagFind)
+// builtinIndex is set to the index in g_tagInfo2, or -1 for a resmgr tag
+static const TAG_INFO2 *GetTagInfo2(u32 tagFind, int *builtinIndex)
 {
 	for (u32 iTag = 0; iTag < sizeof(g_tagInfo2) / sizeof(TAG_INFO2); iTag++)
 	{
 		if (g_tagInfo2[iTag].tag == tagFind)
 		{
+			*builtinIndex = iTag;
 			return &g_tagInfo2[iTag];
 		}
 	}
@@ -570,6 +573,7 @@ static const TAG_INFO2 *GetTagInfo2(u32 tagFind)
 	{
 		if (g_resmgrTagInfo2[iTag].tag == tagFind)
 		{
+			*builtinIndex = -1;
 			return const_cast<const TAG_INFO2 *>(&g_resmgrTagInfo2[iTag]);
 		}
 	}
@@ -577,7 +581,7 @@ static const TAG_INFO2 *GetTagInfo2(u32 tagFind)
 	return NULL; // not found
 }
 
-static std::array<u8, 0x90> expandSeed(const u8 *seed, int key, const u8 *secureId = nullptr)
+static std::array<u8, 0x90> expandSeed(const u8 *seed, int key)
 {
 	std::array<u8, 0x90> expandedSeed;
 
@@ -590,6 +594,36 @@ static std::array<u8, 0x90> expandSeed(const u8 *seed, int key, const u8 *secure
 
 	kirk7(expandedSeed.data(), expandedSeed.data(), expandedSeed.size(), key);
 
+	return expandedSeed;
+}
+
+// The expanded seed of a tag only depends on its key and code, so the seeds of the built-in tags are
+// expanded once, the first time each tag is used, rather than on every decryption attempt (types 2, 5
+// and 6 are tried in turn). The resmgr tags are left uncached as they are meant to be overwritable
+// from OPNSSMP.BIN (see the TODO above g_tagInfo2).
+static std::array<u8, 0x90> expandTagSeed(const TAG_INFO2 *pti, int builtinIndex, const u8 *secureId = nullptr)
+{
+	constexpr size_t numTags = sizeof(g_tagInfo2) / sizeof(TAG_INFO2);
+	static std::array<u8, 0x90> expandedSeeds[numTags];
+	static bool expanded[numTags];
+	static std::mutex lock;
+
+	std::array<u8, 0x90> expandedSeed;
+	if (builtinIndex >= 0)
+	{
+		std::lock_guard<std::mutex> guard(lock);
+		if (!expanded[builtinIndex])
+		{
+			expandedSeeds[builtinIndex] = expandSeed(pti->key, pti->code);
+			expanded[builtinIndex] = true;
+		}
+		expandedSeed = expandedSeeds[builtinIndex];
+	}
+	else
+	{
+		expandedSeed = expandSeed(pti->key, pti->code);
+	}
+
 	if (secureId)
 	{
 		for (auto i = 0u; i < expandedSeed.size(); ++i)
@@ -919,7 +953,8 @@ static int pspDecryptType2(const u8 *inbuf, u8 *outbuf, u32 size)
 {
 	//INFO_LOG(LOADER, "Decrypting tag %08X", pspGetTagVal(inbuf));
 	const auto compSize = pspGetCompSize(inbuf);
-	const auto pti = GetTagInfo2(pspGetTagVal(inbuf));
+	int tagIndex;
+	const auto pti = GetTagInfo2(pspGetTagVal(inbuf), &tagIndex);
 
 	if (!pti)
 	{
@@ -938,7 +973,7 @@ static int pspDecryptType2(const u8 *inbuf, u8 *outbuf, u32 size)
 	}
 
 	// expand the seed into a xor buffer
-	auto xorbuf = expandSeed(pti->key, pti->code);
+	auto xorbuf = expandTagSeed(pti, tagIndex);
 
 	// construct the header format for a type 2 prx
 	PRXType2 type2(inbuf);
@@ -988,7 +1023,8 @@ static int pspDecryptType5(const u8 *inbuf, u8 *outbuf, u32 size, const u8 *secu
 {
 	//INFO_LOG(LOADER, "Decrypting tag %08X", pspGetTagVal(inbuf));
 	const auto compSize = pspGetCompSize(inbuf);
-	const auto pti = GetTagInfo2(pspGetTagVal(inbuf));
+	int tagIndex;
+	const auto pti = GetTagInfo2(pspGetTagVal(inbuf), &tagIndex);
 
 	if (!pti)
 	{
@@ -1003,7 +1039,7 @@ static int pspDecryptType5(const u8 *inbuf, u8 *outbuf, u32 size, const u8 *secu
 	}
 
 	// expand the seed into a xor buffer
-	auto xorbuf = expandSeed(pti->key, pti->code, secureId);
+	auto xorbuf = expandTagSeed(pti, tagIndex, secureId);
 
 	// construct the header format for a type 2 prx
 	PRXType5 type5(inbuf);
@@ -1053,7 +1089,8 @@ static int pspDecryptType6(const u8 *inbuf, u8 *outbuf, u32 size)
 {
 	//INFO_LOG(LOADER, "Decrypting tag %08X", pspGetTagVal(inbuf));
 	const auto compSize = pspGetCompSize(inbuf);
-	const auto pti = GetTagInfo2(pspGetTagVal(inbuf));
+	int tagIndex;
+	const auto pti = GetTagInfo2(pspGetTagVal(inbuf), &tagIndex);
 
 	if (!pti)
 	{
@@ -1068,7 +1105,7 @@ static int pspDecryptType6(const u8 *inbuf, u8 *outbuf, u32 size)
 	}
 
 	// expand the seed into a xor buffer
-	auto xorbuf = expandSeed(pti->key, pti->code);
+	auto xorbuf = expandTagSeed(pti, tagIndex);
 
 	// construct the header format for a type 2 prx
 	PRXType6 type6(inbuf);
@@ -1126,7 +1163,10 @@ int pspDecryptPRX(const u8 *inbuf, u8 *outbuf, u32 size, const u8 *secureId, boo
 	u32 tag = pspGetTagVal(inbuf);
 	int type = -1;
 
-	kirk_init();
+	// Only initialize KIRK on the first call: re-running kirk_init() would rewrite the engine state
+	// under any other thread that is decrypting at the same time.
+	static const int kirkInit = kirk_init();
+	(void)kirkInit;
 
 	//INFO_LOG(LOADER, "Decrypting tag %08X", tag);
 	// this would be significantly better if we had a log of the tags
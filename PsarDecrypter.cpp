@@ -43,6 +43,7 @@ extern "C"
 
 static int OVERHEAD;
 #define SIZE_A      0x110 /* size of uncompressed file entry = 272 bytes */
+#define PSAR_MAGIC  0x50534152 /* "PSAR", big-endian */
 
 int iBase, cbChunk, psarVersion;
 int decrypted;
@@ -118,7 +119,7 @@ static int FindReboot(u8 *input, u8 *output, int size)
     {
         if (memcmp(input+i, "~PSP", 4) == 0)
         {
-            size = *(u32 *)&input[i+0x2C];
+            size = (u32)*(u32_le *)&input[i+0x2C];
 
             memcpy(output, input+i, size);
             return size;
@@ -251,14 +252,10 @@ static int DecodeBlock(const u8* pIn, int cbIn, u8* pOut)
     return cbOut;
 }
 
+// The PSAR header (magic and version) has already been parsed by pspDecryptPSAR
 int pspPSARInit(const u8 *dataPSAR, u8 *dataOut, u8 *dataOut2)
 {
-    if (memcmp(dataPSAR, "PSAR", 4) != 0)
-    {
-        return -1;
-    }
-
-    decrypted = (*(u32 *)&dataPSAR[0x20] == 0x2C333333); // 3.5X M33, and 3.60 unofficial psar's
+    decrypted = ((u32)*(u32_le *)&dataPSAR[0x20] == 0x2C333333); // 3.5X M33, and 3.60 unofficial psar's
 
     if (decrypted)
     {
@@ -269,9 +266,6 @@ int pspPSARInit(const u8 *dataPSAR, u8 *dataOut, u8 *dataOut2)
         OVERHEAD = 0x150;
     }
 
-    //oldschool = (dataPSAR[4] == 1); /* bogus update */
-    psarVersion = dataPSAR[4];
-
     int cbOut;
 
     // at the start of the PSAR file,
@@ -293,7 +287,7 @@ int pspPSARInit(const u8 *dataPSAR, u8 *dataOut, u8 *dataOut2)
 
     if (decrypted)
     {
-        cbOut = DecodeBlock(&dataPSAR[0x10+OVERHEAD+SIZE_A], *(u32 *)&dataOut[0x90], dataOut2);
+        cbOut = DecodeBlock(&dataPSAR[0x10+OVERHEAD+SIZE_A], (u32)*(u32_le *)&dataOut[0x90], dataOut2);
         if (cbOut <= 0)
         {
             return -3;
@@ -349,7 +343,7 @@ int pspPSARGetNextFile(u8 *dataPSAR, int cbFile, u8 *dataOut, u8 *dataOut2, char
     }
 
     strcpy(name, (const char*)&dataOut[4]);
-    u32* pl = (u32*)&dataOut[0x100];
+    const u32_le* pl = (const u32_le*)&dataOut[0x100];
     *signcheck = (dataOut[0x10F] == 2);
 
     // pl[0] is 0
@@ -454,13 +448,16 @@ void makeDirs(std::string filename, bool isDir)
 int pspDecryptPSAR(u8 *dataPSAR, u32 size, std::string outdir, bool extractOnly, u8 *preipl, u32 preiplSize, bool verbose, bool infoOnly, bool keepAll, bool decompPsp)
 {
     kirk_init();
-    if (memcmp(dataPSAR, "PSAR", 4) != 0) {
+    // Parse the PSAR header once: the magic as a single big-endian word, then the version byte
+    if ((u32)*(u32_be *)dataPSAR != PSAR_MAGIC) {
         printf("Invalid PSAR magic\n");
         return 1;
     }
+    //oldschool = (dataPSAR[4] == 1); /* bogus update */
+    psarVersion = dataPSAR[4];
     u8 *data1 = new u8[DATA_SIZE];
     u8 *data2 = new u8[DATA_SIZE];
-    printf("PSAR version %d\n", dataPSAR[4]);
+    printf("PSAR version %d\n", psarVersion);
     int res = pspPSARInit(dataPSAR, data1, data2);
     if (res < 0)
     {
@@ -502,6 +499,10 @@ int pspDecryptPSAR(u8 *dataPSAR, u32 size, std::string outdir, bool extractOnly,
     mkdir((outdir + "/F1").c_str(), 0777);
     mkdir((outdir + "/PSARDUMPER").c_str(), 0777);
 
+    // Entries are handled one at a time on purpose: each header is found from the previous
+    // entry's position (iBase), the file tables decoded from the "...:00000" entries are needed
+    // to name the later "com:"/"01g:"/"02g:" entries, and the reboot/IPL paths share the kirk/ECDSA state.
+    // Batches of separate PRX files can be decrypted concurrently through the Python bindings.
     while (1)
     {
         std::string logStr;
@@ -623,7 +624,7 @@ int pspDecryptPSAR(u8 *dataPSAR, u32 size, std::string outdir, bool extractOnly,
             {
                 // Check if the IPL file is not a kirk1 (or kirk1 with additional keys for 03g+), which means it needs predecryption
                 if (!extractOnly && strncmp(name, "ipl:", 4) == 0
-                    && *(u32*)(data2 + 0x60) != 1 && *(u32*)(data2 + 0x60) != 0x10001)
+                    && (u32)*(u32_le *)(data2 + 0x60) != 1 && (u32)*(u32_le *)(data2 + 0x60) != 0x10001)
                 {
                     // IPL Pre-decryption
                     cbExpanded = pspDecryptPRX(data2, data1, cbExpanded);
@@ -736,7 +737,8 @@ int pspDecryptPSAR(u8 *dataPSAR, u32 size, std::string outdir, bool extractOnly,
             logStr += "empty";
         }
 
-        std::cout << logStr << std::endl;
+        // No std::endl here: flushing after every entry costs a write() per file when the output is redirected
+        std::cout << logStr << '\n';
     }
     printf("Done!\n");
 
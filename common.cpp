@@ -27,13 +27,23 @@ s32 gunzip(u8 *inBuf, u32 inSize, u8 *outBuf, u32 outSize, u32 *realInSize, bool
     infstream.avail_out = outSize;
     infstream.next_out = outBuf;
 
+    int ret;
     if (noHeader) {
-        inflateInit(&infstream);
+        ret = inflateInit(&infstream);
     } else {
-        inflateInit2(&infstream, 16+MAX_WBITS);
+        ret = inflateInit2(&infstream, 16+MAX_WBITS);
+    }
+    if (ret != Z_OK) {
+        return -1;
+    }
+    // The whole input and output are at hand, so inflate in one Z_FINISH call: when the stream
+    // ends inside outBuf zlib skips keeping its own 32K window copy of the output.
+    // A Z_BUF_ERROR after some progress is what Z_NO_FLUSH reported as Z_OK (outBuf or inBuf ran
+    // out), so keep what was produced as before.
+    ret = inflate(&infstream, Z_FINISH);
+    if (ret == Z_BUF_ERROR && (infstream.total_in != 0 || infstream.total_out != 0)) {
+        ret = Z_OK;
     }
-    int ret;
-    ret = inflate(&infstream, Z_NO_FLUSH);
     if (ret != Z_STREAM_END && ret != Z_OK) {
         inflateEnd(&infstream);
         return -1;
@@ -14,7 +14,7 @@ def example_decrypt_prx_from_file():
     print("=== Example: Decrypt PRX from file ===")
     
     if len(sys.argv) < 2:
-        print("Usage: python examples.py <prx_file>")
+        print("Usage: python examples.py <prx_file> [<prx_file> ...]")
         print("No input file provided, skipping file example")
         return
     
@@ -27,9 +27,9 @@ def example_decrypt_prx_from_file():
         # Decrypt the PRX file
         decrypted_data = pspdecrypt.decrypt_prx_file(input_file, verbose=True)
         
-        # Save the decrypted data
+        # Save the decrypted data (a large buffer keeps multi-MB writes to a few syscalls)
         output_file = input_file + ".dec"
-        with open(output_file, 'wb') as f:
+        with open(output_file, 'wb', buffering=1 << 20) as f:
             f.write(decrypted_data)
         
         print(f"Decrypted {len(decrypted_data)} bytes to {output_file}")
@@ -37,6 +37,34 @@ def example_decrypt_prx_from_file():
         print(f"Error: {e}")
 
 
+def example_decrypt_prx_files_threaded():
+    """Example: Decrypt several PRX files in parallel with a thread pool"""
+    print("\n=== Example: Decrypt PRX files in parallel ===")
+
+    # decrypt_prx/decrypt_prx_file release the GIL while decrypting,
+    # so a plain thread pool spreads a batch of files over all cores
+    input_files = [f for f in sys.argv[1:] if os.path.exists(f)]
+    if not input_files:
+        print("No input files provided, skipping threaded example")
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    def decrypt_one(input_file):
+        decrypted_data = pspdecrypt.decrypt_prx_file(input_file)
+        with open(input_file + ".dec", 'wb', buffering=1 << 20) as f:
+            f.write(decrypted_data)
+        return len(decrypted_data)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        futures = {executor.submit(decrypt_one, f): f for f in input_files}
+        for future, input_file in futures.items():
+            try:
+                print(f"{input_file}: decrypted {future.result()} bytes")
+            except Exception as e:
+                print(f"{input_file}: error: {e}")
+
+
 def example_decrypt_prx_from_bytes():
     """Example: Decrypt a PRX from bytes (useful for in-memory processing)"""
     print("\n=== Example: Decrypt PRX from bytes ===")
@@ -156,6 +184,7 @@ def main():
     
     # Run all examples
     example_decrypt_prx_from_file()
+    example_decrypt_prx_files_threaded()
     example_decrypt_prx_from_bytes()
     example_get_prx_info()
     example_decrypt_with_secure_id()
@@ -5,7 +5,8 @@
  * The original code is most likely written directly on assembly and quite obfuscated (which might just be
  * a consequence of heavy optimization). This code is a bit simplified on some points (replaced inlined copies
  * with memcpy, dropped optimized word-by-word copy, dropped a cache instruction) but should be functionally equivalent.
- * It was split into several functions for readability purposes, but corresponds to a single function.
+ * It was split into several functions for readability purposes, but corresponds to a single function; the helpers
+ * are force-inlined so the compiler folds them back into decompress_kle and keeps the coder state in registers.
  *
  * KL3E's assembly code is fairly different from KL4E's, but it was found out that just changing one constant made it
  * work on KL3E. There may be corner cases which are not handled since KL3E's function (sub_00000000 in loadexec)
@@ -30,6 +31,16 @@ typedef int32_t s32;
 
 #define max(a, b) ((a) < (b) ? (b) : (a))
 
+/* The bit readers have to be inlined to keep the coder state out of memory, so don't leave it to the
+ * optimizer's size heuristics (which give up on them at -Os). */
+#if defined(_MSC_VER)
+#define KLE_INLINE static __forceinline
+#elif defined(__GNUC__)
+#define KLE_INLINE static inline __attribute__((always_inline))
+#else
+#define KLE_INLINE static inline
+#endif
+
 /*
  * KL4E's behavior seems to be very similar to LZMA.
  *
@@ -60,10 +71,18 @@ typedef int32_t s32;
  * you consider (for example, Sony uses different probabilities depending on the file's offset modulo 8).
  */
 
+/*
+ * Read the big-endian 32-bit value starting the stream (the initial coder value, or the size for stored data).
+ */
+KLE_INLINE u32 read_be32(const u8 *buf)
+{
+    return ((u32)buf[0] << 24) | ((u32)buf[1] << 16) | ((u32)buf[2] << 8) | buf[3];
+}
+
 /*
  * Read one bit using arithmetic coding, with a given (updated) probability and its associated decay/bonus.
  */
-int read_bit(u32 *inputVal, u32 *range, u8 *probPtr, u8 **inBuf, u32 decay, u32 bonus)
+KLE_INLINE int read_bit(u32 *inputVal, u32 *range, u8 *probPtr, u8 **inBuf, u32 decay, u32 bonus)
 {
     u32 bound;
     u8 prob = *probPtr;
@@ -90,7 +109,7 @@ int read_bit(u32 *inputVal, u32 *range, u8 *probPtr, u8 **inBuf, u32 decay, u32
 /*
  * Same as above, but with balanced probability 1/2.
  */
-int read_bit_uniform(u32 *inputVal, u32 *range, u8 **inBuf)
+KLE_INLINE int read_bit_uniform(u32 *inputVal, u32 *range, u8 **inBuf)
 {
     if (*range >> 24 == 0) {
         *inputVal = (*inputVal << 8) + *((*inBuf)++);
@@ -109,7 +128,7 @@ int read_bit_uniform(u32 *inputVal, u32 *range, u8 **inBuf)
 /*
  * Same as above, but without normalizing the range.
  */
-int read_bit_uniform_nonormal(u32 *inputVal, u32 *range)
+KLE_INLINE int read_bit_uniform_nonormal(u32 *inputVal, u32 *range)
 {
     *range >>= 1;
     if (*inputVal >= *range) {
@@ -122,8 +141,11 @@ int read_bit_uniform_nonormal(u32 *inputVal, u32 *range)
 
 /*
  * Output a raw byte by reading 8 bits using arithmetic coding.
+ * The probability table is picked once per byte, outside the bit loop, so the variable shift only costs
+ * a couple of instructions per literal; compiling one copy of the decoder per shift value made no
+ * measurable difference.
  */
-void output_raw(u32 *inputVal, u32 *range, u8 *probs, u8 **inBuf, u32 *curByte, u8 *curOut, u8 shift)
+KLE_INLINE void output_raw(u32 *inputVal, u32 *range, u8 *probs, u8 **inBuf, u32 *curByte, u8 *curOut, u8 shift)
 {
     u32 mask = (((size_t)curOut & 7) << 8) | (*curByte & 0xFF);
     u8 *curProbs = &probs[((mask >> shift) & 7) * 255] - 1;
@@ -138,20 +160,34 @@ void output_raw(u32 *inputVal, u32 *range, u8 *probs, u8 **inBuf, u32 *curByte,
     *curOut = *curByte & 0xff;
 }
 
-int decompress_kle(u8 *outBuf, int outSize, u8 *inBuf, void **end, int isKl4e)
-{
-    u8 litProbs[2040];
-    u8 copyDistBitsProbs[304];
-    u8 copyDistProbs[144];
+/*
+ * All the probability tables, kept together so they can be initialized with a single memset.
+ * The distance tables are a bit larger than what valid streams use, since a corrupted stream can make
+ * the distance code reach up to copyDistBitsProbs[311] and copyDistProbs[259].
+ */
+typedef struct {
     u8 copyCountBitsProbs[64];
     u8 copyCountProbs[256];
+    u8 copyDistBitsProbs[312];
+    u8 copyDistProbs[260];
+    u8 litProbs[2040];
+} KleProbs;
+
+int decompress_kle(u8 *outBuf, int outSize, u8 *inBuf, void **end, int isKl4e)
+{
+    KleProbs probTables;
+    u8 *litProbs = probTables.litProbs;
+    u8 *copyDistBitsProbs = probTables.copyDistBitsProbs;
+    u8 *copyDistProbs = probTables.copyDistProbs;
+    u8 *copyCountBitsProbs = probTables.copyCountBitsProbs;
+    u8 *copyCountProbs = probTables.copyCountProbs;
     u8 *outEnd = outBuf + outSize;
     u8 *curOut = outBuf;
     u32 curByte = 0;
     u32 range = 0xffffffff;
     u32 copyDist, copyCount;
     u8 *curCopyDistBitsProbs;
-    u32 inputVal = (inBuf[1] << 24) | (inBuf[2] << 16) | (inBuf[3] << 8) | inBuf[4];
+    u32 inputVal = read_be32(&inBuf[1]);
     // Handle the direct copy case (if the file is actually not compressed).
     if (inBuf[0] & 0x80) {
         inBuf += 5;
@@ -159,9 +195,9 @@ int decompress_kle(u8 *outBuf, int outSize, u8 *inBuf, void **end, int isKl4e)
         if (dataEnd >= outEnd) {
             return 0x80000104; // SCE_ERROR_INVALID_SIZE
         }
-        while (curOut < dataEnd) {
-            *(curOut++) = *(inBuf++);
-        }
+        memcpy(curOut, inBuf, inputVal);
+        curOut = dataEnd;
+        inBuf += inputVal;
         inBuf--;
         if (end != NULL) {
             *end = inBuf;
@@ -170,11 +206,7 @@ int decompress_kle(u8 *outBuf, int outSize, u8 *inBuf, void **end, int isKl4e)
     }
     // Initialize probabilities from the header value.
     u8 byte = 128 - (((inBuf[0] >> 3) & 3) << 4);
-    memset(litProbs, byte, sizeof(litProbs));
-    memset(copyCountBitsProbs, byte, sizeof(copyCountBitsProbs));
-    memset(copyDistBitsProbs, byte, sizeof(copyDistBitsProbs));
-    memset(copyCountProbs, byte, sizeof(copyCountProbs));
-    memset(copyDistProbs, byte, sizeof(copyDistProbs));
+    memset(&probTables, byte, sizeof(probTables));
     u8 *curCopyCountBitsProbs = copyCountBitsProbs;
     /* Shift used to determine if the probabilities should be determined more by the
      * output's byte alignment or by the previous byte. */
@@ -206,7 +238,7 @@ int decompress_kle(u8 *outBuf, int outSize, u8 *inBuf, void **end, int isKl4e)
         // Determine the length itself, and use different distance code probabilities depending on it (and on whether it's KL3E or KL4E).
         s32 powLimit;
         if (copyCountBits >= 0) {
-            u8 *probs = &copyCountProbs[(copyCountBits << 5) | ((((size_t)curOut & 3) << (copyCountBits + 3)) & 0x18) | ((size_t)curCopyCountBitsProbs & 7)];
+            u8 *probs = &copyCountProbs[(copyCountBits << 5) | ((((size_t)curOut & 3) << (copyCountBits + 3)) & 0x18) | ((curCopyCountBitsProbs - copyCountBitsProbs) & 7)];
             if (copyCountBits < 3) {
                 copyCount = 1;
             } else {
@@ -336,8 +368,26 @@ int decompress_kle(u8 *outBuf, int outSize, u8 *inBuf, void **end, int isKl4e)
             }
         }
         // Copy the bytes with the given count and distance
-        for (u32 i = 0; i < copyCount + 1; i++) {
-            curOut[i] = (curOut - copyDist - 1)[i];
+        u8 *copySrc = curOut - copyDist - 1;
+        if (copyDist >= copyCount) {
+            memcpy(curOut, copySrc, copyCount + 1);
+        } else if (copyCount < 16) {
+            // The source overlaps the output, so the repeated pattern has to be copied byte by byte.
+            for (u32 i = 0; i < copyCount + 1; i++) {
+                curOut[i] = copySrc[i];
+            }
+        } else {
+            // Long overlapping run: everything between copySrc and the write position is whole
+            // periods of the pattern, so it can be memcpy'd forward, doubling the span each time.
+            u32 done = 0;
+            while (done < copyCount + 1) {
+                u32 n = copyDist + 1 + done;
+                if (n > copyCount + 1 - done) {
+                    n = copyCount + 1 - done;
+                }
+                memcpy(curOut + done, copySrc, n);
+                done += n;
+            }
         }
         curByte = curOut[copyCount];
         curOut += copyCount;
@@ -13,123 +13,178 @@
  */
 
 #include <stdlib.h>
+#include <string.h>
 #include "libLZR.h"
 
-void LZRFillBuffer(unsigned int *test_mask, unsigned int *mask, unsigned int *buffer, unsigned char **next_in) {
+/* range decoder state, shared by the helpers below */
+typedef struct {
+	unsigned int mask;
+	unsigned int buffer;
+	unsigned char *next_in;
+} LZRState;
+
+/* the bit reading helpers are static inline so that they get folded into LZRDecompress */
+static inline void LZRFillBuffer(LZRState *st, unsigned int test_mask) {
 	/* if necessary: fill up in buffer and shift mask */
-	if (*test_mask <= 0x00FFFFFFu) {
-		(*buffer) = ((*buffer) << 8) + *(*next_in)++;
-		*mask = *test_mask << 8;
+	/* note: a branchless variant (shift by 8*renorm, masked byte load) was measured to be no faster, */
+	/* and it always loads *next_in, which may lie past the end of the stream, so keep the branch */
+	if (test_mask <= 0x00FFFFFFu) {
+		st->buffer = (st->buffer << 8) + *st->next_in++;
+		st->mask = test_mask << 8;
 	}
 }
 
-char LZRNextBit(unsigned char *buf_ptr1, int *number, unsigned int *test_mask, unsigned int *mask, unsigned int *buffer, unsigned char **next_in) {
+static inline char LZRNextBit(LZRState *st, unsigned char *buf_ptr1) {
 	/* extract and return next bit of information from in stream, update buffer and mask */
-	LZRFillBuffer(test_mask, mask, buffer, next_in);
-	unsigned int value = (*mask >> 8) * (*buf_ptr1);
-	if (test_mask != mask) *test_mask = value;
+	LZRFillBuffer(st, st->mask);
+	unsigned int value = (st->mask >> 8) * (*buf_ptr1);
 	*buf_ptr1 -= *buf_ptr1 >> 3;
-	if (number) (*number) <<= 1;
-	if (*buffer < value) {
-		*mask = value;		
-		*buf_ptr1 += 31;		
-		if (number) (*number)++;
+	if (st->buffer < value) {
+		st->mask = value;
+		*buf_ptr1 += 31;
 		return 1;
 	} else {
-		*buffer -= value;
-		*mask -= value;
+		st->buffer -= value;
+		st->mask -= value;
 		return 0;
 	}
 }
 
-int LZRGetNumber(signed char n_bits, unsigned char *buf_ptr, char inc, char *flag, unsigned int *mask, unsigned int *buffer, unsigned char **next_in) {
+static inline char LZRNextBitNum(LZRState *st, unsigned char *buf_ptr1, int *number) {
+	/* same as LZRNextBit, and also shift the bit into number */
+	char bit = LZRNextBit(st, buf_ptr1);
+	*number = (*number << 1) + bit;
+	return bit;
+}
+
+static inline char LZRNextBitRange(LZRState *st, unsigned char *buf_ptr1, unsigned int *test_mask) {
+	/* same as LZRNextBit, but *test_mask is used instead of the state mask to decide when to fill up, and receives the bit's range */
+	LZRFillBuffer(st, *test_mask);
+	unsigned int value = (st->mask >> 8) * (*buf_ptr1);
+	*test_mask = value;
+	*buf_ptr1 -= *buf_ptr1 >> 3;
+	if (st->buffer < value) {
+		st->mask = value;
+		*buf_ptr1 += 31;
+		return 1;
+	} else {
+		st->buffer -= value;
+		st->mask -= value;
+		return 0;
+	}
+}
+
+static inline int LZRGetNumber(LZRState *st, signed char n_bits, unsigned char *buf_ptr, int inc, char *flag) {
 	/* extract and return a number (consisting of n_bits bits) from in stream */
+	/* the probability slots are updated in place in buf, inc bytes apart */
+	unsigned char *p1 = buf_ptr + inc, *p2 = buf_ptr + 2*inc, *p3 = buf_ptr + 3*inc;
 	int number = 1;
 	if (n_bits >= 3) {
-		LZRNextBit(buf_ptr+3*inc, &number, mask, mask, buffer, next_in);
+		LZRNextBitNum(st, p3, &number);
 		if (n_bits >= 4) {
-			LZRNextBit(buf_ptr+3*inc, &number, mask, mask, buffer, next_in);
+			LZRNextBitNum(st, p3, &number);
 			if (n_bits >= 5) {
-				LZRFillBuffer(mask, mask, buffer, next_in);
+				LZRFillBuffer(st, st->mask);
+				/* these bits are equiprobable (no probability slot), so decode them branch-free */
 				for (; n_bits >= 5; n_bits--) {
-					number <<= 1;
-					(*mask) >>= 1;
-					if (*buffer < *mask) number++; else (*buffer) -= *mask;
+					unsigned int ge;
+					st->mask >>= 1;
+					ge = st->buffer >= st->mask;
+					number = (number << 1) | (int)(ge ^ 1);
+					st->buffer -= st->mask & (0u - ge);
 				}
 			}
 		}
 	}
-	*flag = LZRNextBit(buf_ptr, &number, mask, mask, buffer, next_in);
+	*flag = LZRNextBitNum(st, buf_ptr, &number);
 	if (n_bits >= 1) {
-		LZRNextBit(buf_ptr+inc, &number, mask, mask, buffer, next_in);
+		LZRNextBitNum(st, p1, &number);
 		if (n_bits >= 2) {
-			LZRNextBit(buf_ptr+2*inc, &number, mask, mask, buffer, next_in);
+			LZRNextBitNum(st, p2, &number);
 		}
 	}	
 	return number;
 }
 
+static inline unsigned char LZRDecodeByte(LZRState *st, unsigned char *buf_ptr) {
+	/* decode a literal: exactly 8 bits walking down the probability tree, unrolled */
+	int number = 1;
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	LZRNextBitNum(st, buf_ptr+number, &number);
+	return (unsigned char)number;
+}
+
 int LZRDecompress(void *out, unsigned int out_capacity, void *in, void *in_end) { 
-	unsigned char **next_in, *tmp, *next_out, *out_end, *next_seq, *seq_end, *buf_ptr1, *buf_ptr2;
+	unsigned char *next_out, *out_end, *next_seq, *seq_end, *buf_ptr1, *buf_ptr2;
 	unsigned char last_char = 0;
-	int seq_len, seq_off, n_bits, buf_off = 0, i, j;	
-	unsigned int mask = 0xFFFFFFFF, test_mask;
+	int seq_len, seq_off, n_bits, buf_off = 0, i, j, ret;
+	unsigned int test_mask;
 	char flag;
+	LZRState st;
+	unsigned char *in_buf = (unsigned char*)in, *out_buf = (unsigned char*)out;
 	
-	signed char type = *(signed char*)in;
-	unsigned int buffer = ((unsigned int)*(unsigned char*)(in+1) << 24) + 
-	                      ((unsigned int)*(unsigned char*)(in+2) << 16) + 
-	                      ((unsigned int)*(unsigned char*)(in+3) <<  8) + 
-	                      ((unsigned int)*(unsigned char*)(in+4)      );	
-	next_in = (in_end) ? in_end : &tmp; //use user provided counter if available
-	*next_in = in + 5;
-	next_out = out;
-	out_end = out + out_capacity;
+	signed char type = (signed char)in_buf[0];
+	st.mask = 0xFFFFFFFF;
+	st.buffer = ((unsigned int)in_buf[1] << 24) + 
+	            ((unsigned int)in_buf[2] << 16) + 
+	            ((unsigned int)in_buf[3] <<  8) + 
+	            ((unsigned int)in_buf[4]      );	
+	st.next_in = in_buf + 5;
+	next_out = out_buf;
+	out_end = out_buf + out_capacity;
 
 	if (type < 0) { 
 		
 		/* copy from stream without decompression */
 
-		seq_end = next_out + buffer;
-		if (seq_end > out_end) return LZR_ERROR_BUFFER_SIZE;
-		while (next_out < seq_end) {
-			*next_out++ = *(*next_in)++;
-		} 
-		(*next_in)++; //skip 1 byte padding
-		return next_out - (unsigned char*)out; 
+		seq_end = next_out + st.buffer;
+		if (seq_end > out_end) {
+			ret = LZR_ERROR_BUFFER_SIZE;
+		} else {
+			memcpy(next_out, st.next_in, st.buffer);
+			next_out = seq_end;
+			st.next_in += st.buffer + 1; //skip 1 byte padding
+			ret = next_out - out_buf; 
+		}
+		if (in_end) *(unsigned char **)in_end = st.next_in; //update user provided counter if available
+		return ret;
 
 	}
 
-	/* create and init buffer */
-	unsigned char *buf = (unsigned char*)malloc(2800);
-	if (!buf) return LZR_ERROR_MEM_ALLOC;
-	for (i = 0; i < 2800; i++) buf[i] = 0x80;
+	/* create and init buffer (on the stack: it is small, and this way it is not leaked on return) */
+	unsigned char buf[2800];
+	memset(buf, 0x80, sizeof(buf));
 
 	while (1) {
 
 		buf_ptr1 = buf + buf_off + 2488;
-		if (!LZRNextBit(buf_ptr1, 0, &mask, &mask, &buffer, next_in)) {
+		if (!LZRNextBit(&st, buf_ptr1)) {
 
 			/* single new char */
 
 			if (buf_off > 0) buf_off--;
-			if (next_out == out_end) return LZR_ERROR_BUFFER_SIZE;
-			buf_ptr1 = buf + (((((((int)(next_out - (unsigned char*)out)) & 0x07) << 8) + last_char) >> type) & 0x07) * 0xFF - 0x01;
-			for (j = 1; j <= 0xFF; ) {
-				LZRNextBit(buf_ptr1+j, &j, &mask, &mask, &buffer, next_in);
-			}
-			*next_out++ = j;
+			if (next_out == out_end) { ret = LZR_ERROR_BUFFER_SIZE; break; }
+			buf_ptr1 = buf + (((((((int)(next_out - out_buf)) & 0x07) << 8) + last_char) >> type) & 0x07) * 0xFF - 0x01;
+			*next_out++ = LZRDecodeByte(&st, buf_ptr1);
 
 		} else {                       
 
 			/* sequence of chars that exists in out stream */
 
 			/* find number of bits of sequence length */			
-			test_mask = mask;
+			/* (no table lookup possible here: every flag bit goes through its own adaptive probability in buf, */
+			/* and indexing the slots by iteration count instead of stepping buf_ptr1 was measured to be no faster) */
+			test_mask = st.mask;
 			n_bits = -1;
 			do {
 				buf_ptr1 += 8;
-				flag = LZRNextBit(buf_ptr1, 0, &test_mask, &mask, &buffer, next_in);
+				flag = LZRNextBitRange(&st, buf_ptr1, &test_mask);
 				n_bits += flag;
 			} while ((flag != 0) && (n_bits < 6));
 			
@@ -137,9 +192,9 @@ int LZRDecompress(void *out, unsigned int out_capacity, void *in, void *in_end)
 			buf_ptr2 = buf + n_bits + 2033;
 			j = 64;
 			if ((flag != 0) || (n_bits >= 0)) {
-				buf_ptr1 = buf + (n_bits << 5) + (((((int)(next_out - (unsigned char*)out)) << n_bits) & 0x03) << 3) + buf_off + 2552;
-				seq_len = LZRGetNumber(n_bits, buf_ptr1, 8, &flag, &mask, &buffer, next_in);
-				if (seq_len == 0xFF) return next_out - (unsigned char*)out; //end of data stream
+				buf_ptr1 = buf + (n_bits << 5) + (((((int)(next_out - out_buf)) << n_bits) & 0x03) << 3) + buf_off + 2552;
+				seq_len = LZRGetNumber(&st, n_bits, buf_ptr1, 8, &flag);
+				if (seq_len == 0xFF) { ret = next_out - out_buf; break; } //end of data stream
 				if ((flag != 0) || (n_bits > 0)) {
 					buf_ptr2 += 56;
 					j = 352;
@@ -152,37 +207,55 @@ int LZRDecompress(void *out, unsigned int out_capacity, void *in, void *in_end)
 			i = 1;
 			do {
 				n_bits = (i << 4) - j;
-				flag = LZRNextBit(buf_ptr2 + (i << 3), &i, &mask, &mask, &buffer, next_in);
+				flag = LZRNextBitNum(&st, buf_ptr2 + (i << 3), &i);
 			} while (n_bits < 0);
 
 			/* find sequence offset */
 			if (flag || (n_bits > 0)) {
 				if (!flag) n_bits -= 8;
-				seq_off = LZRGetNumber(n_bits/8, buf+n_bits+2344, 1, &flag, &mask, &buffer, next_in);
+				seq_off = LZRGetNumber(&st, n_bits/8, buf+n_bits+2344, 1, &flag);
 			} else {
 				seq_off = 1;
 			}
 
 			/* copy sequence */
 			next_seq = next_out - seq_off;
-			if (next_seq < (unsigned char*)out) return LZR_ERROR_INPUT_STREAM;
+			if (next_seq < out_buf) { ret = LZR_ERROR_INPUT_STREAM; break; }
 			seq_end = next_out + seq_len + 1;
-			if (seq_end > out_end) return LZR_ERROR_BUFFER_SIZE;
-			buf_off = ((((int)(seq_end - (unsigned char*)out))+1) & 0x01) + 0x06;
-			do {
-				*next_out++ = *next_seq++;
-			} while (next_out < seq_end);
+			if (seq_end > out_end) { ret = LZR_ERROR_BUFFER_SIZE; break; }
+			buf_off = ((((int)(seq_end - out_buf))+1) & 0x01) + 0x06;
+			if (seq_off >= seq_len + 1) {
+				memcpy(next_out, next_seq, seq_len + 1);
+				next_out = seq_end;
+			} else if (seq_len < 16) {
+				/* the sequence overlaps the bytes being written, so it has to be copied byte by byte */
+				do {
+					*next_out++ = *next_seq++;
+				} while (next_out < seq_end);
+			} else {
+				/* long overlapping run: [next_seq, next_out) already holds whole periods of the
+				   pattern, so it can be memcpy'd forward, doubling the copied span each time */
+				do {
+					unsigned int n = (unsigned int)(next_out - next_seq);
+					if (n > (unsigned int)(seq_end - next_out)) n = (unsigned int)(seq_end - next_out);
+					memcpy(next_out, next_seq, n);
+					next_out += n;
+				} while (next_out < seq_end);
+			}
 
 		}
 		last_char = *(next_out-1);		
 	}
+
+	if (in_end) *(unsigned char **)in_end = st.next_in; //update user provided counter if available
+	return ret;
 }
 
 int LZRCompress(void *out, unsigned int out_capacity, void *in, unsigned int in_length, char type) {
 	unsigned char *next_in, *next_out, *out_end, *seq_end;
-	next_in = in;
-	next_out = out;
-	out_end = out + out_capacity;
+	next_in = (unsigned char*)in;
+	next_out = (unsigned char*)out;
+	out_end = next_out + out_capacity;
 
 	if (type < 0) { 
 		
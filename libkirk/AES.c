@@ -32,6 +32,14 @@
 
 #include "AES.h"
 
+/* -DAES_NO_AESNI builds the portable paths only, as on non-x86 hosts */
+#if !defined(AES_NO_AESNI) && defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+#define AES_USE_AESNI
+#include <cpuid.h>
+#include <wmmintrin.h>
+#include <tmmintrin.h>
+#endif
+
 #undef FULL_UNROLL
 
 
@@ -1303,12 +1311,133 @@ void xor_128(const unsigned char *a, const unsigned char *b, unsigned char *out)
 	}
 }
 
+#ifdef AES_USE_AESNI
+/*
+ * CBC decryption with AES-NI, selected at runtime through cpuid.
+ * CBC decryption has no dependency between blocks (each one is XORed with the
+ * previous ciphertext), so eight blocks are kept in flight to hide the aesdec
+ * latency. The decrypt schedule in dk already has the layout aesdec expects
+ * (reversed, InvMixColumns applied), its words just need a byte swap.
+ */
+static int
+aesni_available(void)
+{
+	static int available = -1;
+	unsigned int eax, ebx, ecx, edx;
+
+	if (available < 0)
+		available = __get_cpuid(1, &eax, &ebx, &ecx, &edx) &&
+		    (ecx & bit_AES) != 0 && (ecx & bit_SSSE3) != 0;
+	return available;
+}
+
+__attribute__((target("aes,ssse3")))
+static void
+aesni_cbc_decrypt(const AES_ctx *ctx, const u8 *src, u8 *dst, int nblocks)
+{
+	const __m128i bswap32 = _mm_set_epi8(12, 13, 14, 15, 8, 9, 10, 11,
+	    4, 5, 6, 7, 0, 1, 2, 3);
+	__m128i rk[AES_MAXROUNDS + 1];
+	__m128i iv = _mm_setzero_si128();
+	__m128i c[8], b[8];
+	int i, j, r, Nr = ctx->Nr;
+
+	for (r = 0; r <= Nr; r++)
+		rk[r] = _mm_shuffle_epi8(
+		    _mm_loadu_si128((const __m128i *)&ctx->dk[4 * r]), bswap32);
+
+	for (i = 0; i + 8 <= nblocks; i += 8) {
+		for (j = 0; j < 8; j++) {
+			c[j] = _mm_loadu_si128((const __m128i *)(src + 16 * (i + j)));
+			b[j] = _mm_xor_si128(c[j], rk[0]);
+		}
+		for (r = 1; r < Nr; r++)
+			for (j = 0; j < 8; j++)
+				b[j] = _mm_aesdec_si128(b[j], rk[r]);
+		for (j = 0; j < 8; j++)
+			b[j] = _mm_aesdeclast_si128(b[j], rk[Nr]);
+		/* all eight ciphertext blocks are in registers, so dst may alias src */
+		_mm_storeu_si128((__m128i *)(dst + 16 * i), _mm_xor_si128(b[0], iv));
+		for (j = 1; j < 8; j++)
+			_mm_storeu_si128((__m128i *)(dst + 16 * (i + j)),
+			    _mm_xor_si128(b[j], c[j - 1]));
+		iv = c[7];
+	}
+	for (; i < nblocks; i++) {
+		c[0] = _mm_loadu_si128((const __m128i *)(src + 16 * i));
+		b[0] = _mm_xor_si128(c[0], rk[0]);
+		for (r = 1; r < Nr; r++)
+			b[0] = _mm_aesdec_si128(b[0], rk[r]);
+		b[0] = _mm_aesdeclast_si128(b[0], rk[Nr]);
+		_mm_storeu_si128((__m128i *)(dst + 16 * i), _mm_xor_si128(b[0], iv));
+		iv = c[0];
+	}
+}
+
+/*
+ * CBC encryption / CBC-MAC with AES-NI. Unlike decryption every block depends
+ * on the previous ciphertext, so this is a single chain; the win comes from
+ * keeping the round keys in registers instead of the Te table lookups.
+ * iv is updated to the last ciphertext block, dst may be NULL when only the
+ * MAC is wanted (AES_CMAC).
+ */
+__attribute__((target("aes,ssse3")))
+static void
+aesni_cbc_encrypt(const AES_ctx *ctx, u8 *iv, const u8 *src, u8 *dst,
+    int nblocks)
+{
+	const __m128i bswap32 = _mm_set_epi8(12, 13, 14, 15, 8, 9, 10, 11,
+	    4, 5, 6, 7, 0, 1, 2, 3);
+	__m128i rk[AES_MAXROUNDS + 1];
+	__m128i c = _mm_loadu_si128((const __m128i *)iv);
+	int i, r, Nr = ctx->Nr;
+
+	/* AES_set_key only sets 10, 12 or 14; telling gcc so lets it see rk[Nr] is set */
+	if (Nr < 10 || Nr > AES_MAXROUNDS)
+		__builtin_unreachable();
+	for (r = 0; r <= Nr; r++)
+		rk[r] = _mm_shuffle_epi8(
+		    _mm_loadu_si128((const __m128i *)&ctx->ek[4 * r]), bswap32);
+
+	for (i = 0; i < nblocks; i++) {
+		c = _mm_xor_si128(c,
+		    _mm_loadu_si128((const __m128i *)(src + 16 * i)));
+		c = _mm_xor_si128(c, rk[0]);
+		for (r = 1; r < Nr; r++)
+			c = _mm_aesenc_si128(c, rk[r]);
+		c = _mm_aesenclast_si128(c, rk[Nr]);
+		if (dst)
+			_mm_storeu_si128((__m128i *)(dst + 16 * i), c);
+	}
+	_mm_storeu_si128((__m128i *)iv, c);
+}
+#endif
+
+/* non-zero when the CBC/CMAC helpers below run on AES instructions */
+int AES_hw_accelerated(void)
+{
+#ifdef AES_USE_AESNI
+	return aesni_available();
+#else
+	return 0;
+#endif
+}
+
 //No IV support!
 void AES_cbc_encrypt(AES_ctx *ctx, const u8 *src, u8 *dst, int size)
 {
 	u8 block_buff[16];
 	
 	int i;
+
+#ifdef AES_USE_AESNI
+	if (aesni_available()) {
+		memset(block_buff, 0, 16);
+		aesni_cbc_encrypt(ctx, block_buff, src, dst, (size + 15) / 16);
+		return;
+	}
+#endif
+
 	for(i = 0; i < size; i+=16)
 	{
 		//step 1: copy block to dst
@@ -1331,6 +1460,13 @@ void AES_cbc_decrypt(AES_ctx *ctx, const u8 *src, u8 *dst, int size)
 	u8 block_buff_previous[16];
 	int i;
 	
+#ifdef AES_USE_AESNI
+	if (aesni_available()) {
+		aesni_cbc_decrypt(ctx, src, dst, size > 16 ? (size + 15) / 16 : 1);
+		return;
+	}
+#endif
+
 	memcpy(block_buff, src, 16);
 	memcpy(block_buff_previous, src, 16);
 	AES_decrypt(ctx, src, dst);
@@ -1358,6 +1494,11 @@ void AES_cbc_decrypt(AES_ctx *ctx, const u8 *src, u8 *dst, int size)
 }
 
 /* AES-CMAC Generation Function */
+/*
+ * This is the only MAC KIRK uses (CMD1/CMD10 header and data hashes). It is a
+ * CBC-MAC over AES, with no GF(2^128) multiply, so there is nothing for
+ * PCLMULQDQ to do here; the chain runs on aesni_cbc_encrypt when available.
+ */
 
 void leftshift_onebit(unsigned char *input,unsigned char *output)
 {
@@ -1449,6 +1590,14 @@ void AES_CMAC (AES_ctx *ctx, unsigned char *input, int length, unsigned char *ma
     }
 
     for ( i=0; i<16; i++ ) X[i] = 0;
+#ifdef AES_USE_AESNI
+    if (aesni_available()) {
+        aesni_cbc_encrypt(ctx, X, input, NULL, n-1);
+        aesni_cbc_encrypt(ctx, X, M_last, NULL, 1);
+        memcpy(mac, X, 16);
+        return;
+    }
+#endif
     for ( i=0; i<n-1; i++ ) 
     {
         xor_128(X,&input[16*i],Y); /* Y := Mi (+) X  */
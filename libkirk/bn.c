@@ -9,6 +9,11 @@
 // Include definitions from kirk header
 #include "kirk_engine.h"
 
+// Byte-digit Montgomery arithmetic, only reached through the ECDSA commands
+// (CMD12/13/16/17) and CMD1's signature check, which is off unless
+// g_checkEcdsa is set. Module and PSAR decryption never get here, so this is
+// kept as the simple portable version rather than 64-bit limbs with MULX/ADX.
+
 void bn_print(char *name, u8 *a, u32 n)
 {
 	u32 i;
@@ -28,6 +28,10 @@
 #include <stdlib.h>
 #include <string.h>
 #include <time.h>
+#include <openssl/evp.h>
+#if OPENSSL_VERSION_NUMBER >= 0x30000000L
+#include <openssl/core_names.h>
+#endif
 #include "kirk_engine.h"
 #include "AES.h"
 #include "SHA1.h"
@@ -35,7 +39,7 @@
 int g_checkEcdsa = 0;
 
 /* ------------------------- KEY VAULT ------------------------- */
-unsigned char keyvault[0x80][0x10] =
+static const unsigned char keyvault[0x80][0x10] =
 {
     {0x2C, 0x92, 0xE5, 0x90, 0x2B, 0x86, 0xC1, 0x06, 0xB7, 0x2E, 0xEA, 0x6C, 0xD4, 0xEC, 0x72, 0x48},
     {0x05, 0x8D, 0xC8, 0x0B, 0x33, 0xA5, 0xBF, 0x9D, 0x56, 0x98, 0xFA, 0xE0, 0xD3, 0x71, 0x5E, 0x1F},
@@ -213,10 +217,152 @@ u32 g_fuse90;  // This is to match FuseID HW at BC100090 and BC100094
 u32 g_fuse94;
 
 AES_ctx aes_kirk1; //global
+static AES_ctx aes_keyvault[0x80]; //expanded CMD4/CMD7 keys, set up once by kirk_init2
 u8 PRNG_DATA[0x14];
 
 char is_kirk_initialized; //"init" emulation
 
+/*
+  OpenSSL objects fetched once by kirk_init2 and released at exit. On OpenSSL 3 every
+  EVP_aes_128_cbc()/EVP_MAC_fetch() use is a provider lookup by name under a lock, which is
+  not something to pay per KIRK command.
+*/
+#if OPENSSL_VERSION_NUMBER >= 0x30000000L
+static EVP_CIPHER *kirk_evp_cbc;
+static EVP_MAC_CTX *kirk_evp_cmac; //AES-128 CMAC template for kirk_cmac to duplicate
+#else
+static const EVP_CIPHER *kirk_evp_cbc;
+#endif
+
+static void kirk_evp_free(void)
+{
+#if OPENSSL_VERSION_NUMBER >= 0x30000000L
+  EVP_CIPHER_free(kirk_evp_cbc);
+  EVP_MAC_CTX_free(kirk_evp_cmac);
+  kirk_evp_cmac = NULL;
+#endif
+  kirk_evp_cbc = NULL;
+}
+
+static void kirk_evp_init(void)
+{
+#if OPENSSL_VERSION_NUMBER >= 0x30000000L
+  static const u8 zero_key[16] = {0};
+  EVP_MAC *cmac;
+  OSSL_PARAM params[2];
+  
+  kirk_evp_cbc = EVP_CIPHER_fetch(NULL, "AES-128-CBC", NULL);
+  cmac = EVP_MAC_fetch(NULL, "CMAC", NULL);
+  kirk_evp_cmac = cmac ? EVP_MAC_CTX_new(cmac) : NULL;
+  EVP_MAC_free(cmac); //the context holds its own reference
+  params[0] = OSSL_PARAM_construct_utf8_string(OSSL_MAC_PARAM_CIPHER, (char*)"AES-128-CBC", 0);
+  params[1] = OSSL_PARAM_construct_end();
+  //OpenSSL 3.0 can only duplicate a CMAC context once it has a key, so the template gets a dummy one
+  if(kirk_evp_cmac != NULL && EVP_MAC_init(kirk_evp_cmac, zero_key, 16, params) != 1)
+  {
+    EVP_MAC_CTX_free(kirk_evp_cmac);
+    kirk_evp_cmac = NULL;
+  }
+#else
+  kirk_evp_cbc = EVP_aes_128_cbc();
+#endif
+  atexit(kirk_evp_free);
+}
+
+/*
+  AES-128-CBC with a zero IV through OpenSSL's EVP interface, which uses AES-NI/ARMv8 AES when
+  the CPU has it. Returns 0 when OpenSSL can't take the job (odd size, partially overlapping
+  buffers, EVP failure) so the caller falls back to the table-based implementation in AES.c.
+*/
+static int kirk_evp_aes_cbc(const u8* key, const u8* src, u8* dst, int size, int enc)
+{
+  static const u8 zero_iv[16] = {0};
+  EVP_CIPHER_CTX *ctx;
+  int outl, ok;
+  
+  if(kirk_evp_cbc == NULL) return 0;
+  if(size <= 0 || (size % 16) != 0) return 0;
+  if(src != dst && src < dst + size && dst < src + size) return 0;
+  
+  ctx = EVP_CIPHER_CTX_new();
+  if(ctx == NULL) return 0;
+  ok = EVP_CipherInit_ex(ctx, kirk_evp_cbc, NULL, key, zero_iv, enc) == 1
+    && EVP_CIPHER_CTX_set_padding(ctx, 0) == 1
+    && EVP_CipherUpdate(ctx, dst, &outl, src, size) == 1;
+  EVP_CIPHER_CTX_free(ctx);
+  return ok;
+}
+
+/*
+  SHA1 through OpenSSL, which picks up the SHA extensions (SHA-NI / ARMv8) when the CPU has them.
+  SHA1.c is only used if EVP fails.
+*/
+static void kirk_sha1(const u8* data, int size, u8* digest)
+{
+  SHA_CTX sha;
+  
+  if(EVP_Digest(data, size, digest, NULL, EVP_sha1(), NULL) == 1) return;
+  SHAInit(&sha);
+  SHAUpdate(&sha, (u8*)data, size);
+  SHAFinal(digest, &sha);
+}
+
+/*
+  Setting up an EVP context costs more than AES.c needs for a few blocks, so payloads below this
+  size stay on the in-tree code, with a schedule expanded on the spot if the caller has none.
+*/
+#define KIRK_EVP_MIN_SIZE 0x200
+
+static void kirk_aes_cbc_encrypt(const u8* key, AES_ctx* schedule, const u8* src, u8* dst, int size)
+{
+  AES_ctx aesKey;
+  
+  if(size >= KIRK_EVP_MIN_SIZE && kirk_evp_aes_cbc(key, src, dst, size, 1)) return;
+  if(schedule == NULL)
+  {
+    AES_set_key(&aesKey, key, 128);
+    schedule = &aesKey;
+  }
+  AES_cbc_encrypt(schedule, src, dst, size);
+}
+
+static void kirk_aes_cbc_decrypt(const u8* key, AES_ctx* schedule, const u8* src, u8* dst, int size)
+{
+  AES_ctx aesKey;
+  
+  if(size >= KIRK_EVP_MIN_SIZE && kirk_evp_aes_cbc(key, src, dst, size, 0)) return;
+  if(schedule == NULL)
+  {
+    AES_set_key(&aesKey, key, 128);
+    schedule = &aesKey;
+  }
+  AES_cbc_decrypt(schedule, src, dst, size);
+}
+
+/*
+  CMAC of a whole CMD1 payload. AES.c only has an accelerated chain on x86 with AES-NI; elsewhere
+  (arm64, old x86) OpenSSL 3's CMAC is several times faster than the table-based AES_CMAC.
+*/
+static void kirk_cmac(const u8* key, AES_ctx* schedule, u8* data, int size, u8* mac)
+{
+#if OPENSSL_VERSION_NUMBER >= 0x30000000L
+  if(size >= KIRK_EVP_MIN_SIZE && kirk_evp_cmac != NULL && !AES_hw_accelerated())
+  {
+    EVP_MAC_CTX *ctx = EVP_MAC_CTX_dup(kirk_evp_cmac);
+    size_t outl;
+    int ok;
+    
+    ok = ctx != NULL
+      && EVP_MAC_init(ctx, key, 16, NULL) == 1
+      && EVP_MAC_update(ctx, data, size) == 1
+      && EVP_MAC_final(ctx, mac, &outl, 16) == 1;
+    EVP_MAC_CTX_free(ctx);
+    if(ok) return;
+  }
+#endif
+  AES_CMAC(schedule, data, size, mac);
+}
+
 /* ------------------------- INTERNAL STUFF END ------------------------- */
 
 
@@ -266,7 +412,6 @@ int kirk_CMD1(u8* outbuff, u8* inbuff, int size)
 {
   KIRK_CMD1_HEADER* header = (KIRK_CMD1_HEADER*)inbuff;
   header_keys keys; //0-15 AES key, 16-31 CMAC key
-  AES_ctx k1;
 	
 	if(size < 0x90) return KIRK_INVALID_SIZE;
   if(is_kirk_initialized == 0) return KIRK_NOT_INITIALIZED;
@@ -277,7 +422,6 @@ int kirk_CMD1(u8* outbuff, u8* inbuff, int size)
   if(header->ecdsa_hash == 1)
   {
     if (g_checkEcdsa) {
-      SHA_CTX sha;
       KIRK_CMD1_ECDSA_HEADER* eheader = (KIRK_CMD1_ECDSA_HEADER*) inbuff;
       u8 kirk1_pub[40];
       u8 header_hash[20];u8 data_hash[20];
@@ -286,16 +430,12 @@ int kirk_CMD1(u8* outbuff, u8* inbuff, int size)
       memcpy(kirk1_pub+20,Py1,20);
       ecdsa_set_pub(kirk1_pub);
       //Hash the Header
-      SHAInit(&sha);
-      SHAUpdate(&sha, (u8*)eheader+0x60, 0x30);
-      SHAFinal(header_hash, &sha);
+      kirk_sha1((u8*)eheader+0x60, 0x30, header_hash);
       
       if(!ecdsa_verify(header_hash,eheader->header_sig_r,eheader->header_sig_s)) {
         return KIRK_HEADER_HASH_INVALID;
       }
-      SHAInit(&sha);
-      SHAUpdate(&sha, (u8*)eheader+0x60, size-0x60);
-      SHAFinal(data_hash, &sha);  
+      kirk_sha1((u8*)eheader+0x60, size-0x60, data_hash);
       
       if(!ecdsa_verify(data_hash,eheader->data_sig_r,eheader->data_sig_s)) {
         return KIRK_DATA_HASH_INVALID;
@@ -306,8 +446,7 @@ int kirk_CMD1(u8* outbuff, u8* inbuff, int size)
     if(ret != KIRK_OPERATION_SUCCESS) return ret;
   }
   
-  AES_set_key(&k1, keys.AES, 128);
-  AES_cbc_decrypt(&k1, inbuff+sizeof(KIRK_CMD1_HEADER)+header->data_offset, outbuff, header->data_size);  
+  kirk_aes_cbc_decrypt(keys.AES, NULL, inbuff+sizeof(KIRK_CMD1_HEADER)+header->data_offset, outbuff, header->data_size);
   
   return KIRK_OPERATION_SUCCESS;
 }
@@ -315,57 +454,49 @@ int kirk_CMD1(u8* outbuff, u8* inbuff, int size)
 int kirk_CMD4(u8* outbuff, u8* inbuff, int size)
 {
   KIRK_AES128CBC_HEADER *header = (KIRK_AES128CBC_HEADER*)inbuff;
-  u8* key;
-  AES_ctx aesKey;
+  const u8* key;
   
   if(is_kirk_initialized == 0) return KIRK_NOT_INITIALIZED;
   if(header->mode != KIRK_MODE_ENCRYPT_CBC) return KIRK_INVALID_MODE;
   if(header->data_size == 0) return KIRK_DATA_SIZE_ZERO;
   
   key = kirk_4_7_get_key(header->keyseed);
-  if(key == (u8*)KIRK_INVALID_SIZE) return KIRK_INVALID_SIZE;
+  if(key == (const u8*)KIRK_INVALID_SIZE) return KIRK_INVALID_SIZE;
   
-  //Set the key
-  AES_set_key(&aesKey, key, 128);
-  AES_cbc_encrypt(&aesKey, inbuff+sizeof(KIRK_AES128CBC_HEADER), outbuff+sizeof(KIRK_AES128CBC_HEADER), header->data_size);
+  kirk_aes_cbc_encrypt(key, &aes_keyvault[header->keyseed], inbuff+sizeof(KIRK_AES128CBC_HEADER), outbuff+sizeof(KIRK_AES128CBC_HEADER), header->data_size);
   
   return KIRK_OPERATION_SUCCESS;
 }
 
 void kirk4(u8* outbuff, const u8* inbuff, size_t size, int keyId)
 {
-  AES_ctx aesKey;
-  u8* key = kirk_4_7_get_key(keyId);
-  AES_set_key(&aesKey, key, 128);
-  AES_cbc_encrypt(&aesKey, inbuff, outbuff, size);
+  const u8* key = kirk_4_7_get_key(keyId);
+  if(key == (const u8*)KIRK_INVALID_SIZE) return;
+  kirk_aes_cbc_encrypt(key, &aes_keyvault[keyId], inbuff, outbuff, size);
 }
 
 int kirk_CMD7(u8* outbuff, u8* inbuff, int size)
 {
   KIRK_AES128CBC_HEADER *header = (KIRK_AES128CBC_HEADER*)inbuff;
-  u8* key;
-  AES_ctx aesKey;
+  const u8* key;
   
   if(is_kirk_initialized == 0) return KIRK_NOT_INITIALIZED;
   if(header->mode != KIRK_MODE_DECRYPT_CBC) return KIRK_INVALID_MODE;
   if(header->data_size == 0) return KIRK_DATA_SIZE_ZERO;
   
   key = kirk_4_7_get_key(header->keyseed);
-  if(key == (u8*)KIRK_INVALID_SIZE) return KIRK_INVALID_SIZE;
+  if(key == (const u8*)KIRK_INVALID_SIZE) return KIRK_INVALID_SIZE;
   
-  //Set the key
-  AES_set_key(&aesKey, key, 128);
-  AES_cbc_decrypt(&aesKey, inbuff+sizeof(KIRK_AES128CBC_HEADER), outbuff, header->data_size);
+  kirk_aes_cbc_decrypt(key, &aes_keyvault[header->keyseed], inbuff+sizeof(KIRK_AES128CBC_HEADER), outbuff, header->data_size);
   
   return KIRK_OPERATION_SUCCESS;
 }
 
 void kirk7(u8* outbuff, const u8* inbuff, size_t size, int keyId)
 {
-  AES_ctx aesKey;
-  u8* key = kirk_4_7_get_key(keyId);
-  AES_set_key(&aesKey, key, 128);
-  AES_cbc_decrypt(&aesKey, inbuff, outbuff, size);
+  const u8* key = kirk_4_7_get_key(keyId);
+  if(key == (const u8*)KIRK_INVALID_SIZE) return;
+  kirk_aes_cbc_decrypt(key, &aes_keyvault[keyId], inbuff, outbuff, size);
 }
 
 int kirk_CMD10(u8* inbuff, int insize)
@@ -390,7 +521,7 @@ int kirk_CMD10(u8* inbuff, int insize)
     //Make sure data is 16 aligned
     chk_size = header->data_size;
     if(chk_size % 16) chk_size += 16 - (chk_size % 16);
-    AES_CMAC(&cmac_key, inbuff+0x60, 0x30 + chk_size + header->data_offset, cmac_data_hash);
+    kirk_cmac(keys.CMAC, &cmac_key, inbuff+0x60, 0x30 + chk_size + header->data_offset, cmac_data_hash);
   
     if(memcmp(cmac_header_hash, header->CMAC_header_hash, 16) != 0) return KIRK_HEADER_HASH_INVALID;
     if(memcmp(cmac_data_hash, header->CMAC_data_hash, 16) != 0) return KIRK_DATA_HASH_INVALID;
@@ -403,13 +534,10 @@ int kirk_CMD10(u8* inbuff, int insize)
 int kirk_CMD11(u8* outbuff, u8* inbuff, int size)
 {
   KIRK_SHA1_HEADER *header = (KIRK_SHA1_HEADER *)inbuff;
-  SHA_CTX sha;
   if(is_kirk_initialized == 0) return KIRK_NOT_INITIALIZED;
   if(header->data_size == 0 || size == 0) return KIRK_DATA_SIZE_ZERO;
   
-	SHAInit(&sha);
-	SHAUpdate(&sha, inbuff+sizeof(KIRK_SHA1_HEADER), header->data_size);
-	SHAFinal(outbuff, &sha);
+  kirk_sha1(inbuff+sizeof(KIRK_SHA1_HEADER), header->data_size, outbuff);
   return KIRK_OPERATION_SUCCESS;
 }
 
@@ -705,13 +833,20 @@ int kirk_init2(u8 * rnd_seed, u32 seed_size, u32 fuseid_90, u32 fuseid_94) {
   //Set KIRK1 main key
   AES_set_key(&aes_kirk1, kirk1_key, 128);
   
+  //Expand the CMD4/CMD7 keys and fetch the OpenSSL objects once, neither ever changes
+  if(is_kirk_initialized == 0)
+  {
+    int i;
+    for(i = 0; i < 0x80; i++) AES_set_key(&aes_keyvault[i], keyvault[i], 128);
+    kirk_evp_init();
+  }
 
   is_kirk_initialized = 1;
   return 0;
 }
-u8* kirk_4_7_get_key(int key_type)
+const u8* kirk_4_7_get_key(int key_type)
 {
-	if((key_type < 0) || (key_type >=0x80)) return (u8*)KIRK_INVALID_SIZE;
+	if((key_type < 0) || (key_type >=0x80)) return (const u8*)KIRK_INVALID_SIZE;
 	return keyvault[key_type];
 }
 
@@ -25,8 +25,8 @@ static const u32 PUPK_MAGIC = 0x5055504B; /* PUPK */
 
 static const u32 MAX_PREIPL_SIZE = 0x1000;
 
-static void checkSkipSceHeader(u8 **ppInData, u32 size, u32 offset = 0);
-static int decryptAndDecompressPrx(u8 *out, const u8 *in, u32 inSize, const u8 *secureId, bool verbose, bool decompPsp = true);
+static int checkSkipSceHeader(const u8 *pInData, u32 size, u32 offset = 0);
+static int decryptAndDecompressPrx(u8 **ppOut, const u8 *in, u32 inSize, const u8 *secureId, bool verbose, bool decompPsp = true);
 
 static inline u32 readMagic(const void *buf)
 {
@@ -248,7 +248,12 @@ int main(int argc, char *argv[]) {
     else {
         u32 pbpOff = 0;
         ScePBPHeader *pbp = nullptr;
-        checkSkipSceHeader(&pInData, size);
+        int sceOff = checkSkipSceHeader(pInData, size);
+        if (sceOff < 0) {
+            return 1;
+        }
+        pInData += sceOff;
+        size -= sceOff;
         switch (readMagic(pInData)) {
         case PSP_MAGIC:
             if (infoOnly) {
@@ -260,7 +265,7 @@ int main(int argc, char *argv[]) {
             }
             else {
                 u8 *outData = new u8[getPspOutputBufferCapacity(pInData)];
-                int outSize = decryptAndDecompressPrx(outData, pInData, pspGetPspSize(pInData), secureId, true, decompPsp);
+                int outSize = decryptAndDecompressPrx(&outData, pInData, pspGetPspSize(pInData), secureId, true, decompPsp);
                 WriteFile(outFile.c_str(), outData, outSize);
                 delete[] outData;
             }
@@ -280,18 +285,24 @@ int main(int argc, char *argv[]) {
                     cout << "Input is a PBP with:" << endl;
                 }
                 if (pspOff < size && !psarOnly) {
-                    checkSkipSceHeader(&pInData, size, pspOff);
-                    if (readMagic(&pInData[pspOff]) == ELF_MAGIC) {
+                    int dataOff = checkSkipSceHeader(pInData, size, pspOff);
+                    if (dataOff < 0) {
+                        return 1;
+                    }
+                    pspOff = dataOff;
+                    u8 *pspData = &pInData[pspOff];
+                    u32 pspMagic = readMagic(pspData);
+                    if (pspMagic == ELF_MAGIC) {
                         if (infoOnly) {
                             cout << "- an unencrypted PSP (ELF) file" << endl;
                         } else {
                             cout << "Non-encrypted PSP file, writing to " << outFile << endl;
-                            WriteFile(outFile.c_str(), &pInData[pspOff], psarOff - pspOff);
+                            WriteFile(outFile.c_str(), pspData, psarOff - pspOff);
                         }
                     }
-                    else if (readMagic(&pInData[pspOff]) == PSP_MAGIC) {
+                    else if (pspMagic == PSP_MAGIC) {
                         if (infoOnly) {
-                            cout << "- an encrypted PSP executable encrypted with tag " << hex << setw(8) << pspGetTagVal(&pInData[pspOff]) << endl;
+                            cout << "- an encrypted PSP executable encrypted with tag " << hex << setw(8) << pspGetTagVal(pspData) << endl;
                         }
                         else if (psarOff - pspOff < PSP_HEADER_SIZE) {
                             cerr << "DATA.PSP file within the input PBP is too small!" << endl;
@@ -299,8 +310,8 @@ int main(int argc, char *argv[]) {
                         }
                         else {
                             cout << "Decrypting PSP file to " << outFile << endl;
-                            u8 *outData = new u8[getPspOutputBufferCapacity(&pInData[pspOff])];
-                            int outSize = decryptAndDecompressPrx(outData, &pInData[pspOff], pspGetPspSize(&pInData[pspOff]), secureId, true, decompPsp);
+                            u8 *outData = new u8[getPspOutputBufferCapacity(pspData)];
+                            int outSize = decryptAndDecompressPrx(&outData, pspData, pspGetPspSize(pspData), secureId, true, decompPsp);
                             WriteFile(outFile.c_str(), outData, outSize);
                             delete[] outData;
                         }
@@ -344,30 +355,36 @@ int main(int argc, char *argv[]) {
     return 0;
 }
 
-static void checkSkipSceHeader(u8 **ppInData, u32 size, u32 offset)
+/* Returns the offset of the data following the SCE header at pInData + offset, offset itself if there is none,
+   or -1 (after printing why) if the header is invalid. */
+static int checkSkipSceHeader(const u8 *pInData, u32 size, u32 offset)
 {
-    const SceHeader *hdr = (const SceHeader *)(&(*ppInData)[offset]);
+    const SceHeader *hdr = (const SceHeader *)&pInData[offset];
+    u32 avail = size - offset;
     /* Skip the useless SCE header, if any. */
     if (hdr->magic == SCE_MAGIC) {
         if (hdr->size < sizeof(SceHeader)) {
             cerr << "Size in SCE header (" << hex << hdr->size << ") is lower than the header!" << endl;
-            exit(1);
+            return -1;
         }
-        if (hdr->size > size) {
+        if (hdr->size > avail) {
             cerr << "Size in SCE header (" << hex << hdr->size << ") points out of bounds!" << endl;
-            exit(1);
+            return -1;
         }
-        else if ((u32)size - hdr->size < 4) { /* we need at least 4 bytes for the magic */
+        else if (avail - hdr->size < 4) { /* we need at least 4 bytes for the magic */
             cerr << "No input data after skipping SCE header" << endl;
-            exit(1);
+            return -1;
         }
-        *ppInData += hdr->size;
         cout << "Skipped SCE header (" << hex << hdr->size << " bytes)" << endl;
+        return offset + hdr->size;
     }
+    return offset;
 }
 
-static int decryptAndDecompressPrx(u8 *out, const u8 *in, u32 inSize, const u8 *secureId, bool verbose, bool decompPsp)
+/* On successful decompression, *ppOut is replaced by the (new[]-allocated) decompressed data buffer. */
+static int decryptAndDecompressPrx(u8 **ppOut, const u8 *in, u32 inSize, const u8 *secureId, bool verbose, bool decompPsp)
 {
+    u8 *out = *ppOut;
     int elfSize, outSize;
 
     elfSize = pspGetElfSize(in);
@@ -382,7 +399,10 @@ static int decryptAndDecompressPrx(u8 *out, const u8 *in, u32 inSize, const u8 *
             u8 *temp = new u8[elfSize];
             outSize = pspDecompress(out, outSize, temp, elfSize, logStr);
             if (outSize == elfSize) {
-                memcpy(out, temp, elfSize);
+                /* Hand the decompressed buffer over instead of copying it back. */
+                delete[] out;
+                *ppOut = temp;
+                temp = nullptr;
                 if (verbose) {
                     printf("Decompression successful (%s)\n", logStr.substr(1).c_str());
                 }
@@ -137,13 +137,24 @@ int pspUnsignCheck(u8 *buf)
 
 int kirk1block(const u8 *pbIn, u8 *pbOut)
 {
-    static u8 g_dataTmp[0x1040] __attribute__((aligned(0x40)));
-    memcpy(g_dataTmp+0x40, pbIn, 0x1000);
-    int ret = sceUtilsBufferCopyWithRange(g_dataTmp, 0x1040, g_dataTmp+0x40, 0x500, 1);
+    const KIRK_CMD1_HEADER *header = (const KIRK_CMD1_HEADER *)pbIn;
+    u32 dataSize = header->data_size;
+    if ((u64)header->data_offset + dataSize > 0x1000 - sizeof(KIRK_CMD1_HEADER)) {
+        return KIRK_INVALID_SIZE;
+    }
+    // Decrypt straight from the block into the output instead of bouncing both through a scratch buffer
+    int ret = sceUtilsBufferCopyWithRange(pbOut, 0x1000, (u8 *)pbIn, 0x500, 1);
     if (ret != 0) {
         return ret;
     }
-    memcpy(pbOut, g_dataTmp, 0x1000);
+    // The payload is decrypted in whole AES blocks. Past those, the block used to hold the scratch
+    // buffer's head (zeroes on the first call) and then the input shifted by 0x40, keep it that way
+    u32 tail = ((dataSize ? dataSize : 1) + 15) & ~15u;
+    if (tail < 0x40) {
+        memset(pbOut + tail, 0, 0x40 - tail);
+        tail = 0x40;
+    }
+    memcpy(pbOut + tail, pbIn + tail - 0x40, 0x1000 - tail);
     return 0;
 }
 
@@ -322,41 +333,37 @@ int decryptIPL(u8 *inData, u32 inDataSize, int version, const char *filename, st
     return 0;
 }
 
-u32 pspGetTagVal(const u8 *buf)
-{
-    return buf ? (u32)*(u32_le *)&buf[0xD0] : 0;
-}
-
-int pspGetElfSize(const u8 *buf)
-{
-    return buf ? (int)*(u32_le *)&buf[0x28] : 0;
-}
-
-int pspGetPspSize(const u8 *buf)
-{
-    return buf ? (int)*(u32_le *)&buf[0x2C] : 0;
-}
-
-int pspGetCompSize(const u8 *buf)
-{
-    return buf ? (int)*(u32_le *)&buf[0xB0] : 0;
-}
-
 ////////// Decompression //////////
 
+/* Leading magic of each compressed format, read as one big-endian word. */
+#define MAGIC_GZIP 0x1F8B      /* upper 16 bits only */
+#define MAGIC_2RLZ 0x32524C5A
+#define MAGIC_KL4E 0x4B4C3445
+#define MAGIC_KL3E 0x4B4C3345
+
 int pspIsCompressed(const u8 *buf)
 {
-	return (buf[0] == 0x1F && buf[1] == 0x8B) || /* GZIP header */
-		   (memcmp(buf, "2RLZ", 4) == 0)      ||
-		   (memcmp(buf, "KL4E", 4) == 0)      ||
-		   (memcmp(buf, "KL3E", 4) == 0);
+	u32 magic = (u32)*(u32_be *)buf;
+	
+	if ((magic >> 16) == MAGIC_GZIP)
+		return 1;
+	switch (magic)
+	{
+	case MAGIC_2RLZ:
+	case MAGIC_KL4E:
+	case MAGIC_KL3E:
+		return 1;
+	default:
+		return 0;
+	}
 }
 
 int pspDecompress(u8 *inbuf, u32 insize, u8 *outbuf, u32 outcapacity, std::string &logStr, u8 **inbufEnd)
 {
 	int retsize;
+	u32 magic = (u32)*(u32_be *)inbuf;
 	
-	if (inbuf[0] == 0x1F && inbuf[1] == 0x8B) 
+	if ((magic >> 16) == MAGIC_GZIP) 
 	{
 	    u32 realSize;
 	    retsize = gunzip(inbuf, insize, outbuf, outcapacity, &realSize);
@@ -364,25 +371,26 @@ int pspDecompress(u8 *inbuf, u32 insize, u8 *outbuf, u32 outcapacity, std::strin
 		    *inbufEnd = inbuf + realSize;
 		}
 	    logStr += ",gzip";
+	    return retsize;
 	}
-	else if (memcmp(inbuf, "2RLZ", 4) == 0) 
+	
+	switch (magic)
 	{
-	    retsize = LZRDecompress(outbuf, outcapacity, inbuf+4, inbufEnd);
+	case MAGIC_2RLZ:
+		retsize = LZRDecompress(outbuf, outcapacity, inbuf+4, inbufEnd);
 		logStr += ",lzrc";
-	}
-	else if (memcmp(inbuf, "KL4E", 4) == 0)
-	{
+		break;
+	case MAGIC_KL4E:
 		retsize = decompress_kle(outbuf, outcapacity, inbuf+4, (void **)inbufEnd, 1);
 		logStr += ",kl4e";
-	}
-	else if (memcmp(inbuf, "KL3E", 4) == 0) 
-	{
+		break;
+	case MAGIC_KL3E:
 		retsize = decompress_kle(outbuf, outcapacity, inbuf+4, (void **)inbufEnd, 0);
 		logStr += ",kl3e";
-	}
-	else
-	{
+		break;
+	default:
 		retsize = -1;
+		break;
 	}
 
 	return retsize;
@@ -3,6 +3,7 @@
 
 #include <string>
 #include "CommonTypes.h"
+#include "PrxDecrypter.h"
 
 /**
  * Sign checks a buffer
@@ -71,28 +72,40 @@ int decryptIPL(u8 *inData, u32 inDataSize, int version, const char *filename, st
  * @param buf Pointer to the ~PSP header buffer (size >= 0x150 bytes)
  * @return PSP module tag 
  */
-u32 pspGetTagVal(const u8 *buf);
+inline u32 pspGetTagVal(const u8 *buf)
+{
+    return buf ? (u32)reinterpret_cast<const PSP_Header *>(buf)->tag : 0;
+}
 
 /**
  * Get the size of the decrypted & decompressed ELF module.
  * @param buf Pointer to the ~PSP header buffer (size >= 0x150 bytes)
  * @return the ELF data size
  */
-int pspGetElfSize(const u8 *buf);
+inline int pspGetElfSize(const u8 *buf)
+{
+    return buf ? (int)reinterpret_cast<const PSP_Header *>(buf)->elf_size : 0;
+}
 
 /**
  * Get the size of the encrypted (possibly compressed first) ELF/PRX data + the PSP header structure.
  * @param buf Pointer to the ~PSP header buffer (size >= 0x150 bytes)
  * @return the PSP data size including header
  */
-int pspGetPspSize(const u8 *buf);
+inline int pspGetPspSize(const u8 *buf)
+{
+    return buf ? (int)reinterpret_cast<const PSP_Header *>(buf)->psp_size : 0;
+}
 
 /**
  * Get the size of the decrypted module data (possibly compressed).
  * @param buf Pointer to the ~PSP header buffer (size >= 0x150 bytes)
  * @return the decrypted data size
  */
-int pspGetCompSize(const u8 *buf);
+inline int pspGetCompSize(const u8 *buf)
+{
+    return buf ? (int)reinterpret_cast<const PSP_Header *>(buf)->comp_size : 0;
+}
 
 /**
  * Checks if buffer is compressed
@@ -104,14 +117,16 @@ int pspGetCompSize(const u8 *buf);
 int pspIsCompressed(const u8 *buf);
 
 /**
- * Decompresses a GZIP or 2RLZ data
+ * Decompresses GZIP, 2RLZ, KL4E or KL3E data, picked from the magic at the start of inbuf
  *
- * @param inbuf - The input buffer with the compressed data
+ * @param inbuf - The input buffer with the compressed data (at least 4 bytes)
  * @param outbuf - The output buffer that receives the decompressed data
  * @param outcapacity - The max capacity of the output buffer
  * @param inbufEnd - Pointer to the end of the compressed stream of the input buffer
  *
- * @returns the size of the decompressed data on success, < 0 on error
+ * @returns the size of the decompressed data on success, < 0 on error.
+ * An unknown magic returns -1 without touching outbuf or logStr, so a separate
+ * pspIsCompressed() call is only needed when the caller must act before decompressing.
 */
 int pspDecompress(u8 *inbuf, u32 insize, u8 *outbuf, u32 outcapacity, std::string &logStr, u8 **inbufEnd = NULL);
 
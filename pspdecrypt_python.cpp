@@ -5,7 +5,6 @@
 
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
-#include <vector>
 #include <string>
 #include <cstring>
 
@@ -20,19 +19,43 @@ extern "C" {
 
 namespace py = pybind11;
 
-// Helper function to decrypt PRX from bytes
-py::bytes decrypt_prx(py::bytes data, py::object secure_id_obj = py::none(), bool verbose = false) {
-    // Initialize KIRK engine
-    static bool kirk_initialized = false;
-    if (!kirk_initialized) {
-        kirk_init();
-        kirk_initialized = true;
+// View a bytes-like argument (bytes, bytearray, memoryview, mmap, 1-D uint8 numpy array...) in place
+static py::buffer_info request_input(const py::buffer& data) {
+    py::buffer_info info = data.request();
+    if (info.itemsize != 1 || info.ndim != 1 || info.strides[0] != 1) {
+        throw std::runtime_error("Input data must be a contiguous bytes-like object");
     }
+    return info;
+}
 
-    // Convert Python bytes to C++ buffer
-    std::string input_str = data;
-    const u8* input_data = reinterpret_cast<const u8*>(input_str.data());
-    u32 input_size = input_str.size();
+// Allocate a bytes object without initializing it, so that it can be filled in place
+static py::bytes new_bytes(size_t size) {
+    PyObject* obj = PyBytes_FromStringAndSize(nullptr, size);
+    if (!obj) {
+        throw py::error_already_set();
+    }
+    return py::reinterpret_steal<py::bytes>(obj);
+}
+
+static u8* bytes_data(const py::bytes& b) {
+    return reinterpret_cast<u8*>(PyBytes_AS_STRING(b.ptr()));
+}
+
+// Shrink a bytes object filled by new_bytes() to the size actually written (a no-op when it is already exact)
+static py::bytes trim_bytes(py::bytes b, size_t size) {
+    PyObject* obj = b.release().ptr();
+    if (_PyBytes_Resize(&obj, size) < 0) {
+        throw py::error_already_set();
+    }
+    return py::reinterpret_steal<py::bytes>(obj);
+}
+
+// Helper function to decrypt PRX from bytes
+py::bytes decrypt_prx(py::buffer data, py::object secure_id_obj = py::none(), bool verbose = false) {
+    // Work on the caller's buffer directly, the decrypter only reads it
+    py::buffer_info input = request_input(data);
+    const u8* input_data = static_cast<const u8*>(input.ptr);
+    u32 input_size = input.size;
 
     if (input_size < PSP_HEADER_SIZE) {
         throw std::runtime_error("Input data is too small (< 0x150 bytes)");
@@ -53,31 +76,40 @@ py::bytes decrypt_prx(py::bytes data, py::object secure_id_obj = py::none(), boo
     }
 
     // Get output buffer size
-    u32 psp_size = pspGetPspSize(input_data);
-    u32 elf_size = pspGetElfSize(input_data);
+    const PSP_Header* header = reinterpret_cast<const PSP_Header*>(input_data);
+    u32 psp_size = header->psp_size;
+    u32 elf_size = header->elf_size;
     u32 output_capacity = std::max(psp_size, elf_size);
     output_capacity = ((output_capacity + 15) / 16) * 16; // Align to 16 bytes
 
-    // Allocate output buffer
-    std::vector<u8> output_buffer(output_capacity);
+    // Decrypt straight into the bytes object that gets returned, it is shrunk to the real size at the end
+    py::bytes output = new_bytes(output_capacity);
+    u8* output_data = bytes_data(output);
 
-    // Decrypt the PRX
-    int output_size = pspDecryptPRX(input_data, output_buffer.data(), input_size, secure_id_ptr, verbose);
+    // Decrypt the PRX, without holding the GIL so several files can be decrypted from different threads
+    int output_size;
+    {
+        py::gil_scoped_release release;
+        output_size = pspDecryptPRX(input_data, output_data, input_size, secure_id_ptr, verbose);
+    }
     
     if (output_size < 0) {
         throw std::runtime_error("PRX decryption failed");
     }
 
     // Check if data is compressed and decompress if needed
-    if (output_size >= 4 && pspIsCompressed(output_buffer.data())) {
+    if (output_size >= 4 && pspIsCompressed(output_data)) {
         std::string log_str;
-        std::vector<u8> temp_buffer(elf_size);
-        int decompressed_size = pspDecompress(output_buffer.data(), output_size, 
-                                               temp_buffer.data(), elf_size, log_str);
+        py::bytes elf = new_bytes(elf_size);
+        int decompressed_size;
+        {
+            py::gil_scoped_release release;
+            decompressed_size = pspDecompress(output_data, output_size, bytes_data(elf), elf_size, log_str);
+        }
         
         if (decompressed_size == elf_size) {
             output_size = decompressed_size;
-            output_buffer = std::move(temp_buffer);
+            output = std::move(elf);
             if (verbose) {
                 py::print("Decompression successful:", log_str.substr(1));
             }
@@ -86,8 +118,7 @@ py::bytes decrypt_prx(py::bytes data, py::object secure_id_obj = py::none(), boo
         }
     }
 
-    // Return as Python bytes
-    return py::bytes(reinterpret_cast<const char*>(output_buffer.data()), output_size);
+    return trim_bytes(std::move(output), output_size);
 }
 
 // Helper function to decrypt PRX from file
@@ -108,56 +139,90 @@ py::bytes decrypt_prx_file(const std::string& filename, py::object secure_id_obj
         throw std::runtime_error("Could not determine file size");
     }
 
-    // Read file data
-    std::vector<u8> file_data(file_size);
-    size_t bytes_read = fread(file_data.data(), 1, file_size, f);
+    // Read the file straight into a Python bytes object and call decrypt_prx
+    PyObject* data_obj = PyBytes_FromStringAndSize(nullptr, file_size);
+    if (!data_obj) {
+        fclose(f);
+        throw py::error_already_set();
+    }
+    py::bytes data = py::reinterpret_steal<py::bytes>(data_obj);
+    size_t bytes_read = fread(PyBytes_AS_STRING(data_obj), 1, file_size, f);
     fclose(f);
 
     if (bytes_read != static_cast<size_t>(file_size)) {
         throw std::runtime_error("Could not read entire file");
     }
 
-    // Convert to Python bytes and call decrypt_prx
-    py::bytes data = py::bytes(reinterpret_cast<const char*>(file_data.data()), file_size);
     return decrypt_prx(data, secure_id_obj, verbose);
 }
 
-// Helper function to get PRX info
-py::dict get_prx_info(py::bytes data) {
-    std::string input_str = data;
-    const u8* input_data = reinterpret_cast<const u8*>(input_str.data());
-    
-    if (input_str.size() < PSP_HEADER_SIZE) {
+// View the ~PSP header at the start of a bytes-like argument; input must outlive the returned pointer
+static const PSP_Header* request_header(const py::buffer_info& input) {
+    if (input.size < PSP_HEADER_SIZE) {
         throw std::runtime_error("Input data is too small (< 0x150 bytes)");
     }
+    return static_cast<const PSP_Header*>(input.ptr);
+}
+
+// Helper function to get PRX info
+py::dict get_prx_info(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    // Read every field from one view of the ~PSP header, instead of one accessor call per field
+    const PSP_Header* header = request_header(input);
 
     py::dict info;
-    info["tag"] = pspGetTagVal(input_data);
-    info["elf_size"] = pspGetElfSize(input_data);
-    info["psp_size"] = pspGetPspSize(input_data);
-    info["comp_size"] = pspGetCompSize(input_data);
-    info["is_compressed"] = pspIsCompressed(input_data) != 0;
+    info["tag"] = (u32)header->tag;
+    info["elf_size"] = (u32)header->elf_size;
+    info["psp_size"] = (u32)header->psp_size;
+    info["comp_size"] = (s32)header->comp_size;
+    info["is_compressed"] = pspIsCompressed(static_cast<const u8*>(input.ptr)) != 0;
     
     return info;
 }
 
-// Helper function to decrypt IPL stage 1
-py::bytes decrypt_ipl1(py::bytes data, bool verbose = false) {
-    // Initialize KIRK engine
-    static bool kirk_initialized = false;
-    if (!kirk_initialized) {
-        kirk_init();
-        kirk_initialized = true;
-    }
+// Single-field header accessors, for callers that only need one value and not the whole dict
+u32 get_psp_tag(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    return request_header(input)->tag;
+}
+
+u32 get_elf_size(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    return request_header(input)->elf_size;
+}
 
-    std::string input_str = data;
-    const u8* input_data = reinterpret_cast<const u8*>(input_str.data());
-    u32 input_size = input_str.size();
+u32 get_psp_size(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    return request_header(input)->psp_size;
+}
+
+s32 get_comp_size(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    return request_header(input)->comp_size;
+}
 
-    std::vector<u8> output_buffer(input_size);
+// Check for a GZIP/KL4E/KL3E/2RLZ magic, i.e. whether decompress() will accept the data
+bool is_compressed(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    return input.size >= 4 && pspIsCompressed(static_cast<const u8*>(input.ptr));
+}
+
+// Helper function to decrypt IPL stage 1
+py::bytes decrypt_ipl1(py::buffer data, bool verbose = false) {
+    py::buffer_info input = request_input(data);
+    const u8* input_data = static_cast<const u8*>(input.ptr);
+    u32 input_size = input.size;
+
+    // The output is never larger than the input, and is written in place (no zero-filled staging buffer)
+    py::bytes output = new_bytes(input_size);
+    u8* output_data = bytes_data(output);
     std::string log_str;
     
-    int output_size = pspDecryptIPL1(input_data, output_buffer.data(), input_size, log_str);
+    int output_size;
+    {
+        py::gil_scoped_release release;
+        output_size = pspDecryptIPL1(input_data, output_data, input_size, log_str);
+    }
     
     if (output_size <= 0) {
         throw std::runtime_error("IPL stage 1 decryption failed");
@@ -167,81 +232,102 @@ py::bytes decrypt_ipl1(py::bytes data, bool verbose = false) {
         py::print("IPL1 decryption:", log_str.substr(1));
     }
 
-    return py::bytes(reinterpret_cast<const char*>(output_buffer.data()), output_size);
+    return trim_bytes(std::move(output), output_size);
 }
 
 // Helper function to linearize IPL stage 2
-py::tuple linearize_ipl2(py::bytes data) {
-    std::string input_str = data;
-    const u8* input_data = reinterpret_cast<const u8*>(input_str.data());
-    u32 input_size = input_str.size();
+py::tuple linearize_ipl2(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    const u8* input_data = static_cast<const u8*>(input.ptr);
+    u32 input_size = input.size;
 
-    std::vector<u8> output_buffer(input_size);
+    py::bytes output = new_bytes(input_size);
+    u8* output_data = bytes_data(output);
     u32 start_addr = 0;
     
-    int output_size = pspLinearizeIPL2(input_data, output_buffer.data(), input_size, &start_addr);
+    int output_size;
+    {
+        py::gil_scoped_release release;
+        output_size = pspLinearizeIPL2(input_data, output_data, input_size, &start_addr);
+    }
     
     if (output_size <= 0) {
         throw std::runtime_error("IPL stage 2 linearization failed");
     }
 
-    py::bytes result = py::bytes(reinterpret_cast<const char*>(output_buffer.data()), output_size);
-    return py::make_tuple(result, start_addr);
+    return py::make_tuple(trim_bytes(std::move(output), output_size), start_addr);
 }
 
 // Helper function to decrypt IPL stage 3
-py::bytes decrypt_ipl3(py::bytes data) {
-    std::string input_str = data;
-    const u8* input_data = reinterpret_cast<const u8*>(input_str.data());
-    u32 input_size = input_str.size();
-
-    std::vector<u8> output_buffer(input_size);
+py::bytes decrypt_ipl3(py::buffer data) {
+    py::buffer_info input = request_input(data);
+    const u8* input_data = static_cast<const u8*>(input.ptr);
+    u32 input_size = input.size;
+
+    // pspDecryptIPL3 stages the input 0x40 bytes into the output buffer, so it needs that much more room
+    u32 output_capacity = input_size + 0x40;
+    py::bytes output = new_bytes(output_capacity);
+    u8* output_data = bytes_data(output);
     
-    int output_size = pspDecryptIPL3(input_data, output_buffer.data(), input_size);
+    int output_size;
+    {
+        py::gil_scoped_release release;
+        output_size = pspDecryptIPL3(input_data, output_data, input_size);
+    }
     
-    if (output_size <= 0) {
+    if (output_size <= 0 || (u32)output_size > output_capacity) {
         throw std::runtime_error("IPL stage 3 decryption failed");
     }
 
-    return py::bytes(reinterpret_cast<const char*>(output_buffer.data()), output_size);
+    return trim_bytes(std::move(output), output_size);
 }
 
 // Helper function to decompress data
-py::bytes decompress(py::bytes data, int max_size = -1, bool verbose = false) {
-    std::string input_str = data;
-    u32 input_size = input_str.size();
-
-    // Copy to mutable buffer since pspDecompress may modify the input
-    std::vector<u8> input_buffer(input_size);
-    memcpy(input_buffer.data(), input_str.data(), input_size);
+py::bytes decompress(py::buffer data, int max_size = -1, bool verbose = false) {
+    // The decompressors only read their input, so hand them the caller's own buffer
+    py::buffer_info input = request_input(data);
+    u8* input_data = static_cast<u8*>(input.ptr);
+    u32 input_size = input.size;
 
-    if (!pspIsCompressed(input_buffer.data())) {
+    if (input_size < 4 || !pspIsCompressed(input_data)) {
         throw std::runtime_error("Input data is not compressed");
     }
 
     // Use max_size or a reasonable default
     u32 output_capacity = (max_size > 0) ? max_size : (input_size * 10);
-    std::vector<u8> output_buffer(output_capacity);
+
+    // Decompress straight into the bytes object that gets returned, then shrink it to the real size
+    py::bytes output = new_bytes(output_capacity);
+    u8* output_data = bytes_data(output);
     std::string log_str;
     
-    int output_size = pspDecompress(input_buffer.data(), input_size, 
-                                     output_buffer.data(), output_capacity, log_str);
+    // Like decrypt_prx, the C++ side touches no Python objects, so other threads can run meanwhile
+    int output_size;
+    {
+        py::gil_scoped_release release;
+        output_size = pspDecompress(input_data, input_size, output_data, output_capacity, log_str);
+    }
     
     if (output_size < 0) {
         throw std::runtime_error("Decompression failed: " + log_str);
     }
 
+    py::bytes result = trim_bytes(std::move(output), output_size);
+
     if (verbose && !log_str.empty()) {
         py::print("Decompression:", log_str.substr(1));
     }
 
-    return py::bytes(reinterpret_cast<const char*>(output_buffer.data()), output_size);
+    return result;
 }
 
 // Module definition
 PYBIND11_MODULE(pspdecrypt, m) {
     m.doc() = "Python bindings for PSP decryption library";
 
+    // Initialize the KIRK engine once at import, so the bindings don't have to check for it on each call
+    kirk_init();
+
     // PRX decryption functions
     m.def("decrypt_prx", &decrypt_prx, 
           "Decrypt a PSP PRX/executable from bytes",
@@ -259,6 +345,22 @@ PYBIND11_MODULE(pspdecrypt, m) {
           "Get information about a PRX file",
           py::arg("data"));
 
+    m.def("get_psp_tag", &get_psp_tag,
+          "Get the encryption tag of a ~PSP header",
+          py::arg("data"));
+
+    m.def("get_elf_size", &get_elf_size,
+          "Get the decrypted ELF size from a ~PSP header",
+          py::arg("data"));
+
+    m.def("get_psp_size", &get_psp_size,
+          "Get the encrypted data size from a ~PSP header",
+          py::arg("data"));
+
+    m.def("get_comp_size", &get_comp_size,
+          "Get the compressed data size from a ~PSP header",
+          py::arg("data"));
+
     // IPL decryption functions
     m.def("decrypt_ipl1", &decrypt_ipl1,
           "Decrypt IPL stage 1",
@@ -274,6 +376,10 @@ PYBIND11_MODULE(pspdecrypt, m) {
           py::arg("data"));
 
     // Compression/decompression
+    m.def("is_compressed", &is_compressed,
+          "Check whether data starts with a GZIP/KL4E/KL3E/2RLZ header",
+          py::arg("data"));
+
     m.def("decompress", &decompress,
           "Decompress GZIP/KL4E/KL3E/2RLZ compressed data",
           py::arg("data"),
@@ -5,9 +5,6 @@ Setup script for pspdecrypt Python bindings
 
 from setuptools import setup, Extension
 from setuptools.command.build_ext import build_ext
-import sys
-import os
-import subprocess
 
 class get_pybind_include(object):
     """Helper class to determine the pybind11 include path"""
@@ -16,6 +13,34 @@ class get_pybind_include(object):
         return pybind11.get_include()
 
 
+class BuildExt(build_ext):
+    """Pick the compile flags for the compiler in use"""
+    # No -maes/-msha/-march=native: libkirk/AES.c compiles its AES-NI code with per-function
+    # target attributes and picks it at runtime through cpuid, and SHA1 goes through OpenSSL,
+    # so one wheel uses the crypto instructions where present and still runs on older CPUs.
+    c_opts = {
+        'msvc': ['/O2', '/EHsc'],
+        'unix': ['-O3', '-Wno-deprecated-declarations'],
+    }
+
+    def build_extensions(self):
+        compiler_type = self.compiler.compiler_type
+        for ext in self.extensions:
+            ext.extra_compile_args = self.c_opts.get(compiler_type, [])
+
+        if compiler_type == 'unix':
+            # The C++ standard flag only goes to the C++ sources, clang rejects -std=c++11 for C files
+            compile_source = self.compiler._compile
+
+            def _compile(obj, src, ext, cc_args, extra_postargs, pp_opts):
+                if not src.endswith('.c'):
+                    extra_postargs = extra_postargs + ['-std=c++11']
+                compile_source(obj, src, ext, cc_args, extra_postargs, pp_opts)
+
+            self.compiler._compile = _compile
+        build_ext.build_extensions(self)
+
+
 # Source files for the extension
 sources = [
     'pspdecrypt_python.cpp',
@@ -46,34 +71,13 @@ ext_modules = [
             './libkirk',
         ],
         libraries=['z', 'crypto'],
-        extra_compile_args=['-O3', '-std=c++11', '-Wno-deprecated-declarations'],
         language='c++',
     ),
 ]
 
+# Package metadata (name, version, dependencies, classifiers) lives in pyproject.toml;
+# this file only describes how to build the extension module.
 setup(
-    name='pspdecrypt',
-    version='1.0.0',
-    author='pspdecrypt contributors',
-    description='Python bindings for PSP decryption library',
-    long_description=open('Readme.md').read() if os.path.exists('Readme.md') else '',
-    long_description_content_type='text/markdown',
     ext_modules=ext_modules,
-    install_requires=['pybind11>=2.6.0'],
-    setup_requires=['pybind11>=2.6.0'],
-    python_requires='>=3.6',
-    classifiers=[
-        'Development Status :: 4 - Beta',
-        'Intended Audience :: Developers',
-        'License :: OSI Approved :: GNU General Public License v3 (GPLv3)',
-        'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
-        'Programming Language :: Python :: 3.7',
-        'Programming Language :: Python :: 3.8',
-        'Programming Language :: Python :: 3.9',
-        'Programming Language :: Python :: 3.10',
-        'Programming Language :: Python :: 3.11',
-        'Programming Language :: Python :: 3.12',
-        'Programming Language :: C++',
-    ],
+    cmdclass={'build_ext': BuildExt},
 )
@@ -6,7 +6,7 @@
 #include <string.h>
 #include "libkirk/AES.h"
 
-unsigned char sc_secret_01_tabl[0x400] = 
+static const unsigned char sc_secret_01_tabl[0x400] = 
 {   0x1A, 0x52, 0x1B, 0xDE, 0x7A, 0xDB, 0x8D, 0xDF, 0xF6, 0x07, 0x9F, 0xCC, 0x0F, 0x0B, 0x67, 0x14, 
     0x8C, 0x8F, 0x46, 0x24, 0xFA, 0xE0, 0x2C, 0x2C, 0x7F, 0xF5, 0x71, 0x1C, 0x93, 0x9A, 0xA7, 0x02, 
     0xAB, 0xE2, 0x8F, 0xE7, 0xDA, 0x89, 0x08, 0x27, 0x3D, 0xEF, 0x6E, 0x42, 0x07, 0x95, 0xB3, 0x30, 
@@ -72,7 +72,7 @@ unsigned char sc_secret_01_tabl[0x400] =
     0xFC, 0x35, 0x4C, 0xF0, 0xFF, 0xD1, 0xC5, 0xA2, 0x7B, 0x8D, 0xE3, 0x0C, 0xC5, 0xF0, 0x11, 0xD9, 
     0x8F, 0xD3, 0xDF, 0xE5, 0x45, 0x8B, 0xBD, 0x95, 0xAF, 0x2A, 0x19, 0x2B, 0x6D, 0x64, 0xE3, 0xA2 };
 
-unsigned char sc_secret_02_tabl[0x400] = 
+static const unsigned char sc_secret_02_tabl[0x400] = 
 {   0x1A, 0x52, 0x1B, 0xDE, 0x7A, 0xDB, 0x8D, 0xDF, 0xF6, 0x07, 0x9F, 0xCC, 0x0F, 0x0B, 0x67, 0x14, 
     0x8C, 0x8F, 0x46, 0x24, 0xFA, 0xE0, 0x2C, 0x2C, 0x7F, 0xF5, 0x71, 0x1C, 0x93, 0x9A, 0xA7, 0x02, 
     0xAB, 0xE2, 0x8F, 0xE7, 0xDA, 0x89, 0x08, 0x27, 0x3D, 0xEF, 0x6E, 0x42, 0x07, 0x95, 0xB3, 0x30, 
@@ -138,7 +138,7 @@ unsigned char sc_secret_02_tabl[0x400] =
     0x5C, 0x94, 0xD9, 0x36, 0x0D, 0x24, 0x3B, 0xE1, 0xF4, 0x68, 0x63, 0x18, 0x41, 0x19, 0x54, 0x3D, 
     0x58, 0xEA, 0x73, 0x85, 0xBE, 0xAB, 0xA4, 0x04, 0x6A, 0x51, 0xC5, 0x17, 0xF1, 0x0D, 0xB5, 0xD9 };
 
-unsigned char sc_secret_03_tabl[0x400] = 
+static const unsigned char sc_secret_03_tabl[0x400] = 
 {   0x1A, 0x52, 0x1B, 0xDE, 0x7A, 0xDB, 0x8D, 0xDF, 0xF6, 0x07, 0x9F, 0xCC, 0x0F, 0x0B, 0x67, 0x14, 
     0x8C, 0x8F, 0x46, 0x24, 0xFA, 0xE0, 0x2C, 0x2C, 0x7F, 0xF5, 0x71, 0x1C, 0x93, 0x9A, 0xA7, 0x02, 
     0xAB, 0xE2, 0x8F, 0xE7, 0xDA, 0x89, 0x08, 0x27, 0x3D, 0xEF, 0x6E, 0x42, 0x07, 0x95, 0xB3, 0x30, 
@@ -205,7 +205,7 @@ unsigned char sc_secret_03_tabl[0x400] =
     0x3C, 0x48, 0xFB, 0x02, 0xE6, 0x5E, 0x40, 0x02, 0x57, 0x72, 0xF9, 0x58, 0xCF, 0x16, 0x6B, 0x5F };
 
 
-unsigned char sc_secret_GO_tabl[0x400] = 
+static const unsigned char sc_secret_GO_tabl[0x400] = 
 {   0x1A, 0x52, 0x1B, 0xDE, 0x7A, 0xDB, 0x8D, 0xDF, 0xF6, 0x07, 0x9F, 0xCC, 0x0F, 0x0B, 0x67, 0x14,
     0x8C, 0x8F, 0x46, 0x24, 0xFA, 0xE0, 0x2C, 0x2C, 0x7F, 0xF5, 0x71, 0x1C, 0x93, 0x9A, 0xA7, 0x02, 
     0xAB, 0xE2, 0x8F, 0xE7, 0xDA, 0x89, 0x08, 0x27, 0x3D, 0xEF, 0x6E, 0x42, 0x07, 0x95, 0xB3, 0x30, 
@@ -273,7 +273,7 @@ unsigned char sc_secret_GO_tabl[0x400] =
 
 
 
-unsigned char *tablemap[8] =
+static const unsigned char * const tablemap[8] =
 {   0,
     sc_secret_01_tabl,
     sc_secret_02_tabl,
@@ -283,7 +283,7 @@ unsigned char *tablemap[8] =
     sc_secret_03_tabl,
     sc_secret_03_tabl};
 
-int modelmap[13] = 
+static const int modelmap[13] = 
 {   0, // 00g -hah
     0, // 01g
     1, // 02g
@@ -302,18 +302,18 @@ int modelmap[13] =
 
 
 
-unsigned char ipl02_1[0x18] = { 0x61, 0x7A, 0x56, 0x42, 0xF8, 0xED, 0xC5, 0xE4, 0xDB, 0xB1, 0x1E, 0x20, 0x48, 0x83, 0xB1, 0x6F, 0x04, 0xF4, 0x69, 0x8A, 0x8C, 0xAA, 0x95, 0x30};
+static const unsigned char ipl02_1[0x18] = { 0x61, 0x7A, 0x56, 0x42, 0xF8, 0xED, 0xC5, 0xE4, 0xDB, 0xB1, 0x1E, 0x20, 0x48, 0x83, 0xB1, 0x6F, 0x04, 0xF4, 0x69, 0x8A, 0x8C, 0xAA, 0x95, 0x30};
 
-unsigned char ipl04_1[0x18] = { 0x8D, 0x5D, 0xA6, 0x08, 0xF2, 0xBB, 0xC6, 0xCC, 0x34, 0xDB, 0x81, 0x24, 0x1D, 0x6F, 0x40, 0x57, 0xE0, 0xDC, 0x41, 0xAF, 0xC2, 0xCD, 0x1C, 0x2D};
+static const unsigned char ipl04_1[0x18] = { 0x8D, 0x5D, 0xA6, 0x08, 0xF2, 0xBB, 0xC6, 0xCC, 0x34, 0xDB, 0x81, 0x24, 0x1D, 0x6F, 0x40, 0x57, 0xE0, 0xDC, 0x41, 0xAF, 0xC2, 0xCD, 0x1C, 0x2D};
 
-unsigned char iplXX_1[0x18] = { 0x79, 0x7B, 0xF6, 0xF3, 0xE3, 0x3B, 0x37, 0x56, 0xE0, 0xE8, 0x6A, 0xDA, 0x60, 0x95, 0x3A, 0x0F, 0xDC, 0xBF, 0x3C, 0xEB, 0x9D, 0xD4, 0x41, 0x4E};
+static const unsigned char iplXX_1[0x18] = { 0x79, 0x7B, 0xF6, 0xF3, 0xE3, 0x3B, 0x37, 0x56, 0xE0, 0xE8, 0x6A, 0xDA, 0x60, 0x95, 0x3A, 0x0F, 0xDC, 0xBF, 0x3C, 0xEB, 0x9D, 0xD4, 0x41, 0x4E};
 
-unsigned char  sc_key[0x10] = { 0xF1, 0x07, 0x30, 0xC3, 0x11, 0xE0, 0x26, 0xFC, 0xF8, 0x7B, 0x50, 0xAE, 0xA3, 0xD1, 0x7B, 0xA0 };
+static const unsigned char  sc_key[0x10] = { 0xF1, 0x07, 0x30, 0xC3, 0x11, 0xE0, 0x26, 0xFC, 0xF8, 0x7B, 0x50, 0xAE, 0xA3, 0xD1, 0x7B, 0xA0 };
 
 
 
 
-int getSysconIndex(unsigned char * data) {
+static int getSysconIndex(unsigned char * data) {
     AES_ctx scindexkey;
     unsigned char result[0x10];
     AES_set_key(&scindexkey,sc_key,128);
@@ -324,7 +324,7 @@ int getSysconIndex(unsigned char * data) {
 
 void getSysconIPLKey(int type, unsigned char * indata, unsigned char * outdata) {
     int index = getSysconIndex(indata);
-    unsigned char * table;
+    const unsigned char * table;
     if(type <13) {
         table = tablemap[modelmap[type]];
     } else {
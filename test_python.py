@@ -28,6 +28,11 @@ expected_functions = [
     'decrypt_prx',
     'decrypt_prx_file',
     'get_prx_info',
+    'get_psp_tag',
+    'get_elf_size',
+    'get_psp_size',
+    'get_comp_size',
+    'is_compressed',
     'decrypt_ipl1',
     'linearize_ipl2',
     'decrypt_ipl3',
@@ -59,7 +64,79 @@ try:
 except Exception as e:
     print(f"  ✗ get_prx_info failed: {e}")
 
+# Test 4: Concurrent calls from several threads (the bindings release the GIL while working)
+print("\nTest 4: Test concurrent calls")
+failed = False
+try:
+    import gzip
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    payloads = [bytes([i]) * 0x100000 + os.urandom(0x1000) for i in range(8)]
+    compressed = [gzip.compress(p) for p in payloads]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(
+            lambda c: pspdecrypt.decompress(c, max_size=0x101000), compressed))
+    if results == payloads:
+        print(f"  ✓ {len(payloads)} buffers decompressed concurrently")
+    else:
+        print("  ✗ Concurrent decompress returned wrong data")
+        failed = True
+
+    # A pure-Python counter can only advance during a long decompress if the GIL is released.
+    # The switch interval is raised so that the calling thread never hands the GIL over on its own.
+    big = gzip.compress(bytes(0x4000000), compresslevel=1)
+    count = 0
+    stop = threading.Event()
+
+    def counter():
+        global count
+        while not stop.is_set():
+            count += 1
+
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(0.5)
+    thread = threading.Thread(target=counter)
+    thread.start()
+    try:
+        before = count
+        out = pspdecrypt.decompress(big, max_size=0x4000000)
+        progress = count - before
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(old_interval)
+    if len(out) == 0x4000000 and progress > 0:
+        print(f"  ✓ Python thread ran during decompress ({progress} iterations)")
+    else:
+        print("  ✗ Python thread made no progress during decompress, the GIL was held")
+        failed = True
+
+    # The IPL bindings reacquire the GIL before raising on bad input
+    ipl_functions = [pspdecrypt.decrypt_ipl1, pspdecrypt.linearize_ipl2, pspdecrypt.decrypt_ipl3]
+
+    def call_ipl(func):
+        try:
+            func(bytes(0x2000))
+        except RuntimeError:
+            return True
+        return False
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        raised = list(executor.map(call_ipl, ipl_functions * 8))
+    if all(raised):
+        print(f"  ✓ {len(raised)} concurrent IPL calls raised RuntimeError")
+    else:
+        print("  ✗ Concurrent IPL calls did not raise RuntimeError")
+        failed = True
+except Exception as e:
+    print(f"  ✗ Concurrent calls failed: {e}")
+    failed = True
+
 print("\n" + "=" * 50)
 print("Basic tests completed!")
 print("\nTo test with real PSP files, run:")
 print("  python3 examples.py <path_to_prx_file>")
+
+if failed:
+    sys.exit(1)